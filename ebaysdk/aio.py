@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+'''
+Copyright 2012-2019 eBay Inc.
+Authored by: Tim Keefer
+Licensed under CDDL 1.0
+'''
+
+import asyncio
+import functools
+import ssl
+import time
+import weakref
+
+from datetime import timedelta
+
+# pylint: disable=import-error
+import aiohttp
+from yarl import URL
+# pylint: enable=import-error
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from ebaysdk import log
+
+# kept-alive connections of a client session, see client_session()
+LIMIT = 100
+
+_sessions = weakref.WeakKeyDictionary()
+_ssl_contexts = dict()
+
+
+def client_session():
+    """Returns the aiohttp.ClientSession of the running event loop.
+
+    Calls are sent through it unless execute_async() is given a session,
+    so all connections share one pool of up to LIMIT kept-alive
+    connections per loop. close_sessions() closes it.
+    """
+
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=LIMIT))
+        _sessions[loop] = session
+
+    return session
+
+
+async def close_sessions():
+    "Closes the client session of the running event loop."
+
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+def _get_ssl(verify):
+    "Returns the aiohttp ssl argument for a connection's verify."
+
+    if verify is True or verify is False:
+        return verify
+
+    context = _ssl_contexts.get(verify)
+    if context is None:
+        context = _ssl_contexts[verify] = ssl.create_default_context(cafile=verify)
+
+    return context
+
+
+async def _iter_body(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def send(connection, request, request_id, session=None):
+    """Sends a requests.PreparedRequest with aiohttp.
+
+    Returns a requests.Response, so the response is processed exactly as
+    the ones sent with requests.
+    """
+
+    connection._log_request(request, request_id)
+
+    # aiohttp frames the body itself
+    headers = dict((k, v) for k, v in request.headers.items()
+                   if k.lower() not in ('content-length', 'transfer-encoding'))
+
+    body = request.body
+    if body is not None and not isinstance(body, (bytes, str)):
+        body = _iter_body(body)
+
+    if session is None:
+        session = client_session()
+
+    started = time.time()
+
+    async with session.request(
+            request.method, URL(request.url, encoded=True),
+            data=body, headers=headers,
+            proxy=connection.proxies.get(request.url.partition(':')[0]),
+            ssl=_get_ssl(connection.verify),
+            # connect and read timeouts, like requests
+            timeout=aiohttp.ClientTimeout(total=None,
+                                          sock_connect=connection.timeout,
+                                          sock_read=connection.timeout)) as resp:
+
+        response = Response()
+        response.status_code = resp.status
+        response.reason = resp.reason
+        response.headers = CaseInsensitiveDict(resp.headers)
+        response.url = str(resp.url)
+        response.request = request
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = await resp.read()
+
+    response.elapsed = timedelta(seconds=time.time() - started)
+
+    log.debug('RESPONSE (%s):' % request_id)
+    log.debug('elapsed time=%s' % response.elapsed)
+    log.debug('status code=%s' % response.status_code)
+    log.debug('headers=%s' % response.headers)
+
+    return response
+
+
+async def execute(connection, verb, request, request_id, list_nodes,
+                  materialize, fields, started, parse_response=True,
+                  session=None, offload=False):
+    """Sends a prepared request and returns its CallResult, see
+    BaseConnection.execute_async().
+    """
+
+    response = await send(connection, request, request_id, session)
+
+    process = functools.partial(
+        connection._call_result, verb, request, request_id, response,
+        list_nodes, materialize, fields, started, parse_response)
+
+    if offload:
+        result = await asyncio.get_running_loop().run_in_executor(
+            None if offload is True else offload, process)
+    else:
+        result = process()
+
+    connection._raise_for_result(result)
+    return result
@@ -25,12 +25,24 @@ class Config(object):
     >>> c.set('number', 22)
     >>> c.get('number')
     22
+
+    version is bumped whenever set() changes a value, so callers can
+    cache what they derive from the config:
+
+    >>> v = c.version
+    >>> c.set('number', 22, force=True)
+    >>> c.version == v
+    True
+    >>> c.set('number', 23, force=True)
+    >>> c.version == v + 1
+    True
     """
 
     def __init__(self, domain, connection_kwargs=dict(), config_file='ebay.yaml'):
         self.config_file = config_file
         self.domain = domain
         self.values = dict()
+        self.version = 0
         self.config_file_used = []
         self.connection_kwargs = connection_kwargs
 
@@ -80,17 +92,22 @@ class Config(object):
 
         if force:
             # log.debug('set (force): %s=%s' % (cKey, defaultValue))
-            self.values.update({cKey: defaultValue})
+            self._update(cKey, defaultValue)
 
         elif cKey in self.connection_kwargs and self.connection_kwargs[cKey] is not None:
             # log.debug('set: %s=%s' % (cKey, self.connection_kwargs[cKey]))
-            self.values.update({cKey: self.connection_kwargs[cKey]})
+            self._update(cKey, self.connection_kwargs[cKey])
 
         # otherwise, use yaml default and then fall back to
         # the default set in the __init__()
         else:
             if cKey not in self.values:
                 # log.debug('set: %s=%s' % (cKey, defaultValue))
-                self.values.update({cKey: defaultValue})
+                self._update(cKey, defaultValue)
             else:
                 pass
+
+    def _update(self, cKey, value):
+        if cKey not in self.values or self.values[cKey] != value:
+            self.values[cKey] = value
+            self.version += 1
@@ -8,21 +8,32 @@ Licensed under CDDL 1.0
 
 from ebaysdk import log
 
+import logging
+import os
 import re
+import threading
 import time
 import uuid
 import webbrowser
 
+from collections import defaultdict, namedtuple
+
+from lxml.etree import XPath  # pylint: disable-msg=E0611
 from requests import Request, Session
 from requests.adapters import HTTPAdapter
+from requests.compat import urlparse
+from requests.utils import guess_filename
+from urllib3.fields import RequestField
+from urllib3.filepost import choose_boundary
 
 from xml.dom.minidom import parseString
 from xml.parsers.expat import ExpatError
 
 from ebaysdk import set_stream_logger, UserAgent
 from ebaysdk.utils import getNodeText as getNodeTextUtils, smart_encode, smart_decode
-from ebaysdk.utils import getValue, smart_encode_request_data
-from ebaysdk.response import Response
+from ebaysdk.utils import getValue, smart_encode_request_data, PARSER_OPTIONS
+from ebaysdk.utils import RequestTemplate, RequestBody, iter_dict2xml
+from ebaysdk.response import Response, PreciseDatetimeNodes
 from ebaysdk.exception import ConnectionError, ConnectionResponseError
 
 HTTP_SSL = {
@@ -30,13 +41,457 @@ HTTP_SSL = {
     True: 'https',
 }
 
+_node_index_cache = dict()
+
+
+def compile_node_index(nodes):
+    """Compiles dotted node paths into a dict of frozensets keyed by the
+    root element of each path (e.g. 'getordersresponse').
+
+    Indexes are memoized on the node list contents, so every connection
+    of the same API class shares one compiled copy.
+
+    >>> index = compile_node_index(['getordersresponse.orderarray.order',
+    ...                             'getitemresponse.item.pictureurl'])
+    >>> sorted(index.keys())
+    ['getitemresponse', 'getordersresponse']
+    >>> 'getordersresponse.orderarray.order' in index['getordersresponse']
+    True
+    >>> nodes = ['getitemresponse.item.pictureurl']
+    >>> compile_node_index(nodes) is compile_node_index(list(nodes))
+    True
+    """
+
+    key = tuple(nodes)
+    index = _node_index_cache.get(key)
+
+    if index is None:
+        buckets = defaultdict(set)
+        for node in key:
+            buckets[node.partition('.')[0]].add(node)
+
+        index = dict((k, frozenset(v)) for k, v in buckets.items())
+        _node_index_cache[key] = index
+
+    return index
+
+
+_datetime_nodes_cache = dict()
+
+
+def compile_datetime_nodes(nodes, precise=False):
+    """Compiles datetime node names into a lowercase frozenset, a
+    PreciseDatetimeNodes one when precise is set.
+
+    Sets are memoized on the node list contents, so every connection
+    of the same API class shares one compiled copy.
+
+    >>> nodes = compile_datetime_nodes(['Timestamp', 'endtime'])
+    >>> sorted(nodes)
+    ['endtime', 'timestamp']
+    >>> nodes is compile_datetime_nodes(['Timestamp', 'endtime'])
+    True
+    >>> type(compile_datetime_nodes(['Timestamp'], precise=True)).__name__
+    'PreciseDatetimeNodes'
+    """
+
+    key = (tuple(nodes), precise)
+    compiled = _datetime_nodes_cache.get(key)
+
+    if compiled is None:
+        nodeset = PreciseDatetimeNodes if precise else frozenset
+        compiled = nodeset(n.lower() for n in key[0])
+        _datetime_nodes_cache[key] = compiled
+
+    return compiled
+
+
+ErrorRecord = namedtuple('ErrorRecord', 'severity code message fields')
+
+# errors and warnings hold the messages of all records, failures only the
+# errors the call fails with, which depends on the Ack
+ResponseErrors = namedtuple('ResponseErrors', 'errors warnings records codes failures')
+
+
+def format_error(verb, errors):
+    """Returns the api error message for the errors, or None.
+
+    >>> format_error('GetItem', ['Internal Server Error', 'Code: 10007, bad'])
+    'GetItem: Internal Server Error, Code: 10007, bad'
+    >>> format_error('GetItem', []) is None
+    True
+    """
+
+    if not errors:
+        return None
+
+    # Force all errors to be unicode in a proper way
+    errors = [smart_decode(smart_encode(e)) for e in errors]
+    return u"{verb}: {message}".format(verb=verb, message=u", ".join(errors))
+
+
+class ErrorExtractor(object):
+    """Pulls structured error and warning records out of a response dom.
+
+    elements  -- paths of the error elements, the first one that matches wins
+    fields    -- child elements copied into each record (missing ones are None)
+    severity  -- field holding the severity, 'Warning' records are warnings
+    code      -- field holding the error code, converted with code_type
+    message   -- format string for the message, applied to the fields and code
+    code_type -- code conversion, codes it can't convert are None
+    encode    -- fields passed through smart_encode before formatting
+    ack       -- paths of the Ack element, the first one found is used
+    ack_success -- errors only count when Ack isn't 'Success', rather than
+                   when Ack is 'Failure'
+    missing_ack_fails -- with ack_success, errors count when there's no Ack
+
+    >>> extractor = ErrorExtractor(
+    ...     'Errors', ('SeverityCode', 'ErrorCode', 'ShortMessage'),
+    ...     severity='SeverityCode', code='ErrorCode',
+    ...     message='Code: {ErrorCode}, {ShortMessage}')
+    >>> from ebaysdk.utils import get_dom_tree
+    >>> dom = get_dom_tree('<R><Ack>Failure</Ack><Errors><ShortMessage>bad</ShortMessage><ErrorCode>10007</ErrorCode></Errors></R>')
+    >>> extractor.records(dom)
+    [ErrorRecord(severity=None, code=10007, message='Code: 10007, bad', fields={'SeverityCode': None, 'ErrorCode': '10007', 'ShortMessage': 'bad'})]
+    >>> extractor.ack(dom)
+    'Failure'
+    >>> extractor.marker
+    'Errors'
+    """
+
+    def __init__(self, elements, fields, severity, code, message,
+                 code_type=int, encode=(), ack='Ack', ack_success=False,
+                 missing_ack_fails=True):
+
+        if isinstance(elements, str):
+            elements = [elements]
+        if isinstance(ack, str):
+            ack = [ack]
+
+        self._elements = [XPath(e) for e in elements]
+        self._fields = tuple(fields)
+        self._field_set = frozenset(fields)
+        self._severity = severity
+        self._code = code
+        self._message = message
+        self._code_type = code_type
+        self._encode = tuple(encode)
+        self._ack = tuple(ack)
+
+        self.ack_success = ack_success
+        self.missing_ack_fails = missing_ack_fails
+
+        # all error element paths end in the same tag, which has to be in
+        # the raw payload for there to be any errors at all
+        self.marker = elements[0].rpartition('/')[2]
+
+    def records(self, dom):
+        "Returns an ErrorRecord for every error element of the dom."
+
+        nodes = []
+        for path in self._elements:
+            nodes = path(dom)
+            if nodes:
+                break
+
+        records = []
+        for e in nodes:
+            fields = dict.fromkeys(self._fields)
+            seen = set()
+
+            for child in e:
+                # findall(...)[0], the first match wins
+                if child.tag in self._field_set and child.tag not in seen:
+                    seen.add(child.tag)
+                    fields[child.tag] = child.text
+
+            for name in self._encode:
+                if fields[name] is not None:
+                    fields[name] = smart_encode(fields[name])
+
+            code = fields[self._code]
+            if code is not None:
+                try:
+                    code = self._code_type(code)
+                except ValueError:
+                    code = None
+
+            message = str(self._message).format(code=code, **fields)
+            records.append(ErrorRecord(fields[self._severity], code, message, fields))
+
+        return records
+
+    def ack(self, dom):
+        "Returns the stripped Ack text, or None when there isn't one."
+
+        for path in self._ack:
+            text = dom.findtext(path)
+            if text is not None:
+                return text.strip()
+
+        return None
+
+
+REQUEST_CHUNK_SIZE = 65536
+
+# stands in for the request dict when splitting an envelope
+REQUEST_BODY_MARKER = '\x00body\x00'
+
+
+def iter_multipart(fields, files, boundary, chunk_size=REQUEST_CHUNK_SIZE):
+    """Yields the multipart/form-data body requests builds for data=fields
+    and files=files, without holding it in memory.
+
+    Field values may be iterables of encoded chunks, file objects are
+    read chunk_size bytes at a time.
+    """
+
+    def part(rf):
+        return smart_encode_request_data(
+            '--%s\r\n%s' % (boundary, rf.render_headers()))
+
+    for name, value in fields.items():
+        rf = RequestField(name=name, data=None)
+        rf.make_multipart()
+        yield part(rf)
+
+        if isinstance(value, (str, bytes)):
+            yield smart_encode_request_data(value)
+        else:
+            for chunk in value:
+                yield chunk
+
+        yield b'\r\n'
+
+    for name, value in (files.items() if isinstance(files, dict) else files):
+        content_type = headers = None
+
+        if isinstance(value, (tuple, list)):
+            filename, fp = value[:2]
+            if len(value) > 2:
+                content_type = value[2]
+            if len(value) > 3:
+                headers = value[3]
+        else:
+            filename, fp = guess_filename(value) or name, value
+
+        if fp is None:
+            continue
+
+        rf = RequestField(name=name, data=None, filename=filename, headers=headers)
+        rf.make_multipart(content_type=content_type)
+        yield part(rf)
+
+        if hasattr(fp, 'read'):
+            while True:
+                chunk = fp.read(chunk_size)
+                if not chunk:
+                    break
+                yield smart_encode_request_data(chunk)
+        else:
+            yield smart_encode_request_data(fp)
+
+        yield b'\r\n'
+
+    yield smart_encode_request_data('--%s--\r\n' % boundary)
+
+
+def new_session(pool_connections=10, pool_maxsize=10):
+    "Returns a requests.Session with the retrying, pooling adapters mounted."
+
+    session = Session()
+    for prefix in ('http://', 'https://'):
+        session.mount(prefix, HTTPAdapter(max_retries=3,
+                                          pool_connections=pool_connections,
+                                          pool_maxsize=pool_maxsize))
+
+    return session
+
+
+_sessions = dict()
+_sessions_lock = threading.Lock()
+_sessions_pid = os.getpid()
+
+
+def _reset_sessions():
+    global _sessions_lock, _sessions_pid
+
+    # the sockets of the pools belong to the parent process, so they are
+    # dropped rather than closed
+    _sessions.clear()
+    _sessions_lock = threading.Lock()
+    _sessions_pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_sessions)
+
+
+def shared_session(url, proxy=None, pool_connections=10, pool_maxsize=10):
+    """Returns the process-wide session for the scheme and host of url.
+
+    Connections created with shared_session=True (the default) send their
+    calls through these, so the kept-alive connections outlive any one
+    connection object. Sessions are keyed by scheme, host, proxy and pool
+    size, and are forgotten in a forked child.
+
+    >>> s = shared_session('https://api.ebay.com/ws/api.dll')
+    >>> s is shared_session('https://api.ebay.com/wsapi')
+    True
+    >>> s is shared_session('https://svcs.ebay.com/services/search/FindingService/v1')
+    False
+    """
+
+    if _sessions_pid != os.getpid():
+        _reset_sessions()
+
+    parts = urlparse(url)
+    key = (parts.scheme, parts.netloc, proxy, pool_connections, pool_maxsize)
+
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = new_session(pool_connections,
+                                                       pool_maxsize)
+
+    return session
+
+
+def close_sessions():
+    "Closes and forgets all shared sessions, see shared_session()."
+
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+
+    for session in sessions:
+        session.close()
+
+
+class PreparedCall(object):
+    """A call serialized and prepared once, see BaseConnection.prepare_call().
+
+    request() copies the prepared request with the slots filled in and a
+    new X-EBAY-SDK-REQUEST-ID, execute() sends it. Both are rebuilt when
+    the connection config changes.
+    """
+
+    def __init__(self, connection, verb, data, list_nodes=[], verb_attrs=None,
+                 materialize=None, fields=None):
+
+        self.connection = connection
+        self.verb = verb
+        self.data = data
+        self.verb_attrs = verb_attrs
+        self.materialize = materialize
+        self.fields = fields
+        self.list_nodes = connection._get_list_nodes(verb, list_nodes)
+        self._prepared = (None, None, None)
+
+    def _get_prepared(self):
+        conn = self.connection
+        cache = conn._get_request_cache()
+        cached, template, request = self._prepared
+
+        if cached is not cache:
+            template = conn.compile_request(self.verb, self.data, self.verb_attrs)
+            request = Request(conn.method,
+                              conn._get_request_url(self.verb),
+                              data=template.render(
+                                  **dict.fromkeys(template.slots, '')).body,
+                              headers=dict(conn._get_request_headers(self.verb)),
+                              ).prepare()
+            self._prepared = (cache, template, request)
+
+        return template, request
+
+    def request(self, **values):
+        "Returns a new requests.PreparedRequest with the slots filled in."
+
+        template, prepared = self._get_prepared()
+        body = template.render(**values).body
+
+        request = prepared.copy()
+        request.body = body
+        request.headers['Content-Length'] = str(len(body))
+        request.headers['X-EBAY-SDK-REQUEST-ID'] = str(uuid.uuid4())
+
+        return request
+
+    def execute(self, **values):
+        "Sends the call, see BaseConnection.execute_prepared()."
+
+        return self.connection.execute_prepared(self, values)
+
+
+class CallResult(object):
+    """The outcome of BaseConnection.call(), independent of the connection.
+
+    verb           -- the verb called
+    request        -- the requests.PreparedRequest sent
+    request_id     -- its X-EBAY-SDK-REQUEST-ID
+    response       -- the ebaysdk.response.Response
+    response_error -- the HTTP reason when the status isn't 200
+    body_errors    -- the ResponseErrors of the response body
+    started        -- time.time() when the call started
+    elapsed        -- seconds the call took, response.elapsed is the HTTP part
+    """
+
+    def __init__(self, verb, request, request_id, response, response_error,
+                 body_errors, started, elapsed):
+
+        self.verb = verb
+        self.request = request
+        self.request_id = request_id
+        self.response = response
+        self.response_error = response_error
+        self.body_errors = body_errors
+        self.started = started
+        self.elapsed = elapsed
+
+    @property
+    def errors(self):
+        "The errors the call failed with, including the HTTP error."
+
+        if self.response_error:
+            return [self.response_error] + self.body_errors.failures
+
+        return self.body_errors.failures
+
+    @property
+    def warnings(self):
+        return self.body_errors.warnings
+
+    @property
+    def error_records(self):
+        return self.body_errors.records
+
+    @property
+    def response_codes(self):
+        return self.body_errors.codes
+
+    def error(self):
+        "Returns the api error message, like BaseConnection.error()."
+
+        return format_error(self.verb, self.errors)
+
 
 class BaseConnection(object):
     """Base Connection Class."""
 
+    error_extractor = None
+
+    # namespace prefix for the elements of request dicts, see dict2xml()
+    request_namespace = None
+
     def __init__(self, debug=False, method='GET',
                  proxy_host=None, timeout=20, proxy_port=80,
-                 parallel=None, escape_xml=False, **kwargs):
+                 parallel=None, escape_xml=False, lazy_reply=False,
+                 materialize=None, preserve_order=False, stream_request=False,
+                 pool_connections=10, pool_maxsize=10, verify=True,
+                 shared_session=True, precise_datetimes=False, **kwargs):
 
         if debug:
             set_stream_logger()
@@ -51,8 +506,19 @@ class BaseConnection(object):
         self.proxy_host = proxy_host
         self.proxy_port = proxy_port
         self.escape_xml = escape_xml
+        self.preserve_order = preserve_order
+        self.stream_request = stream_request
+        self.verify = verify
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.lazy_reply = lazy_reply
+        self.materialize = materialize
         self.datetime_nodes = []
-        self._list_nodes = []
+        self.precise_datetimes = precise_datetimes
+        self._list_nodes = frozenset()
+        self._list_node_index = (None, 0, {})
+        self._datetime_node_set = (None, 0, False, frozenset())
+        self._request_cache = (None, None, {})
 
         self.proxies = dict()
         if self.proxy_host:
@@ -62,9 +528,10 @@ class BaseConnection(object):
                 'https': proxy
             }
 
-        self.session = Session()
-        self.session.mount('http://', HTTPAdapter(max_retries=3))
-        self.session.mount('https://', HTTPAdapter(max_retries=3))
+        # sessions keep their connections alive between calls, see close()
+        self._session = None
+        if not shared_session:
+            self._session = new_session(pool_connections, pool_maxsize)
 
         self.parallel = parallel
 
@@ -73,6 +540,64 @@ class BaseConnection(object):
 
         self._reset()
 
+    @property
+    def config(self):
+        return self._config
+
+    @config.setter
+    def config(self, config):
+        # defaults the XML parser options once, see _get_parser_options()
+        if config is not None:
+            for name, default in PARSER_OPTIONS.items():
+                config.set(name, default)
+
+        self._config = config
+
+    @property
+    def session(self):
+        """The requests.Session calls are sent with.
+
+        Unless the connection was created with shared_session=False, this
+        is the shared_session() for the endpoint, shared with every other
+        connection to it. Setting it gives the connection its own session.
+        """
+
+        if self.request is not None:
+            return self._get_session(self.request.url)
+
+        return self._get_session('%s://%s' % (
+            HTTP_SSL[self.config.get('https', True)], self.config.get('domain')))
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+    def _get_session(self, url):
+        if self._session is not None:
+            return self._session
+
+        return shared_session(url, self.proxies.get(urlparse(url).scheme),
+                              self.pool_connections, self.pool_maxsize)
+
+    def close(self):
+        """Closes the kept-alive connections of the connection's own
+        session. Shared sessions are left open for the other connections,
+        see close_sessions().
+
+        Connections are otherwise reused by the following calls. The
+        connection can also be used as a context manager, which closes
+        it on exit.
+        """
+
+        if self._session is not None:
+            self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def debug_callback(self, debug_type, debug_message):
         log.debug('type: ' + str(debug_type) + ' message' + str(debug_message))
 
@@ -86,7 +611,9 @@ class BaseConnection(object):
         self.response = None
         self.request = None
         self.verb = None
-        self._list_nodes = []
+        self._list_nodes = frozenset()
+        self._materialize = self.materialize
+        self._fields = None
         self._request_id = None
         self._request_dict = {}
         self._time = time.time()
@@ -98,6 +625,7 @@ class BaseConnection(object):
         self._response_error = None
         self._resp_body_errors = []
         self._resp_body_warnings = []
+        self._resp_body_error_records = []
         self._resp_codes = []
 
     def _add_prefix(self, nodes, verb):
@@ -107,49 +635,360 @@ class BaseConnection(object):
                     nodes[i] = "%sresponse.%s" % (
                         verb.lower(), nodes[i].lower())
 
-    def execute(self, verb, data=None, list_nodes=[], verb_attrs=None, files=None):
-        "Executes the HTTP request."
+    def _get_datetime_nodes(self):
+        """Returns the compiled frozenset of datetime_nodes."""
+
+        nodes = getattr(self, 'datetime_nodes', [])
+        precise = self.precise_datetimes
+        cached_nodes, cached_len, cached_precise, compiled = self._datetime_node_set
+
+        if cached_nodes is not nodes or cached_len != len(nodes) \
+                or cached_precise != precise:
+            compiled = compile_datetime_nodes(nodes, precise)
+            self._datetime_node_set = (nodes, len(nodes), precise, compiled)
+
+        return compiled
+
+    def _get_request_cache(self):
+        config = self.config
+        version = getattr(config, 'version', None)
+        cached_config, cached_version, cache = self._request_cache
+
+        if cached_config is not config or cached_version != version:
+            cache = dict()
+            self._request_cache = (config, version, cache)
+
+        return cache
+
+    def _get_request_headers(self, verb):
+        """Returns build_request_headers() for the verb plus the User-Agent.
+
+        The headers are cached per verb until the config changes, so
+        build_request_headers() must only depend on the verb and config.
+        The returned dict is shared, copy it before changing it.
+        """
+
+        cache = self._get_request_cache()
+        headers = cache.get(('headers', verb))
+
+        if headers is None:
+            headers = self.build_request_headers(verb)
+            headers['User-Agent'] = UserAgent
+            cache[('headers', verb)] = headers
+
+        return headers
+
+    def _get_request_url(self, verb):
+        "Returns build_request_url() for the verb, cached like the headers."
+
+        cache = self._get_request_cache()
+        url = cache.get(('url', verb))
+
+        if url is None:
+            url = cache[('url', verb)] = self.build_request_url(verb)
+
+        return url
+
+    def _get_parser_options(self):
+        """Returns the XML parser options, see utils.PARSER_OPTIONS.
+
+        Each option can be set in the YAML config or passed to the
+        connection, e.g. Connection(huge_tree=True) for GetCategories.
+        They are read once per config version.
+        """
+
+        if self.config is None:
+            return None
+
+        cache = self._get_request_cache()
+        options = cache.get('parser_options')
+
+        if options is None:
+            options = dict((name, self.config.get(name, default))
+                           for name, default in PARSER_OPTIONS.items())
+            cache['parser_options'] = options
+
+        return options
+
+    def _get_list_nodes(self, verb, list_nodes=[]):
+        """Returns the frozenset of node paths forced to lists for this verb.
+
+        base_list_nodes is compiled once (see compile_node_index) and only
+        the bucket for the verb's response element is used.
+        """
+
+        base_nodes = getattr(self, 'base_list_nodes', [])
+        cached_nodes, cached_len, index = self._list_node_index
+
+        if cached_nodes is not base_nodes or cached_len != len(base_nodes):
+            index = compile_node_index(base_nodes)
+            self._list_node_index = (base_nodes, len(base_nodes), index)
+
+        if verb:
+            nodes = index.get('%sresponse' % verb.lower(), frozenset())
+        else:
+            nodes = frozenset().union(*index.values())
+
+        if list_nodes:
+            extra_nodes = list(list_nodes)
+            self._add_prefix(extra_nodes, verb)
+            nodes = nodes.union(extra_nodes)
+
+        return nodes
+
+    def execute(self, verb, data=None, list_nodes=[], verb_attrs=None, files=None,
+                stream_nodes=None, materialize=None, fields=None):
+        """Executes the HTTP request.
+
+        When stream_nodes is given (e.g. ['OrderArray.Order']) the response
+        body is not loaded up front. An iterator is returned instead which
+        yields one ResponseDataObject per matching node, see
+        Response.iter_nodes(). Error checking runs once it is exhausted.
+
+        materialize picks which of 'dom', 'dict', 'reply' and 'raw' the
+        Response builds up front and keeps (default: all of them), the
+        others are built on first use.
+
+        fields projects the response onto the given paths, relative to
+        the response element (e.g. ['OrderArray.Order.OrderID']). Nodes
+        outside the projection are skipped while parsing and are missing
+        from dom, dict and reply. Ack and errors are always kept. Nodes
+        yielded by stream_nodes are not projected.
+
+        The request, response and errors are kept on the connection, so
+        it serves one call at a time. call() leaves the connection alone.
+        """
         log.debug('execute: verb=%s data=%s' % (verb, data))
 
         self._reset()
 
-        self._list_nodes += list_nodes
-        self._add_prefix(self._list_nodes, verb)
-
-        if hasattr(self, 'base_list_nodes'):
-            self._list_nodes += self.base_list_nodes
+        self._list_nodes = self._get_list_nodes(verb, list_nodes)
+        if materialize is not None:
+            self._materialize = materialize
+        self._fields = fields
 
         self.build_request(verb, data, verb_attrs, files)
-        self.execute_request()
 
-        if hasattr(self.response, 'content'):
-            self.process_response()
-            self.error_check()
+        return self._send(stream_nodes)
+
+    def call(self, verb, data=None, list_nodes=[], verb_attrs=None, files=None,
+             materialize=None, fields=None):
+        """Executes the HTTP request without changing the connection.
+
+        Returns a CallResult holding the request, response, errors and
+        timings, instead of keeping them on the connection like
+        execute(). One connection can so serve calls from many threads.
+        The arguments are those of execute(), which is built on the same
+        steps. Errors raise ConnectionError like execute() does, they
+        are only found with error_extractor though, the error methods of
+        the connection are not called.
+        """
+        log.debug('call: verb=%s data=%s' % (verb, data))
+
+        started = time.time()
+
+        request, request_id = self._prepare_request(verb, data, verb_attrs, files)
+        result = self._call_result(
+            verb, request, request_id, self._send_request(request, request_id),
+            self._get_list_nodes(verb, list_nodes),
+            self.materialize if materialize is None else materialize,
+            fields, started)
+
+        self._raise_for_result(result)
+        return result
+
+    def execute_async(self, verb, data=None, list_nodes=[], verb_attrs=None,
+                      files=None, materialize=None, fields=None, session=None,
+                      offload=False):
+        """Coroutine version of call(), for asyncio:
+
+            result = await api.execute_async('findItemsAdvanced',
+                                             {'keywords': 'shoes'})
+            result.response.reply.searchResult
+
+        The request is built as for execute() and sent with aiohttp, which
+        has to be installed, through ebaysdk.aio.client_session() unless
+        session is given. Like call(), it returns a CallResult and leaves
+        the connection alone, so one connection serves any number of
+        concurrent calls.
+
+        offload parses the response in an executor instead of on the
+        event loop, True for the loop's default executor.
+        """
+        from ebaysdk import aio
+
+        started = time.time()
+
+        request, request_id = self._prepare_request(verb, data, verb_attrs, files)
+        return aio.execute(self, verb, request, request_id,
+                           self._get_list_nodes(verb, list_nodes),
+                           self.materialize if materialize is None else materialize,
+                           fields, started, session=session, offload=offload)
+
+    def prepare_call(self, verb, data, list_nodes=[], verb_attrs=None,
+                     materialize=None, fields=None):
+        """Returns a PreparedCall for repeating a call with a few changed
+        fields, e.g. the page number while paginating.
+
+        data is compiled like compile_request(), the changing leaves are
+        given as ebaysdk.utils.Slot('name'). The headers, url and
+        requests.PreparedRequest are also built once, every call only
+        fills in the slots and gets a new request id:
+
+            call = api.prepare_call('GetOrders', {
+                'Pagination': {'PageNumber': Slot('page')}})
+            for page in range(1, 4):
+                call.execute(page=page)
+
+        The other arguments are those of execute().
+        """
+
+        return PreparedCall(self, verb, data, list_nodes, verb_attrs,
+                            materialize, fields)
+
+    def execute_prepared(self, call, values, request_dict=None):
+        """Like execute(), for a PreparedCall with the slots given in the
+        values dict.
+
+        request_dict is the request dict the call amounts to, kept on the
+        connection like the data given to execute(), e.g. for paginating.
+        The shape of the call, with its slots, is never kept.
+        """
+
+        log.debug('execute: verb=%s values=%s' % (call.verb, values))
+
+        self._reset()
+
+        self._list_nodes = call.list_nodes
+        if call.materialize is not None:
+            self._materialize = call.materialize
+        self._fields = call.fields
+
+        self.verb = call.verb
+        self._request_dict = request_dict
+        self.request = call.request(**values)
+        self._request_id = self.request.headers['X-EBAY-SDK-REQUEST-ID']
+
+        return self._send()
 
-        log.debug('total time=%s' % (time.time() - self._time))
+    def _send(self, stream_nodes=None):
+        if stream_nodes or self.parallel:
+            self.execute_request(stream=bool(stream_nodes))
+
+            if stream_nodes and self.response is not None:
+                self.process_response(stream_nodes=stream_nodes)
+                return self._iter_response()
+
+            return self.response
+
+        if self._overrides_execute_steps():
+            self.execute_request()
+
+            if hasattr(self.response, 'content'):
+                self.process_response()
+                self.error_check()
+                self.response.release()
+
+            log.debug('total time=%s' % (time.time() - self._time))
+
+            return self.response
+
+        self.response = self._send_request(self.request, self._request_id)
+        result = self._call_result(self.verb, self.request, self._request_id,
+                                   self.response, self._list_nodes,
+                                   self._materialize, self._fields, self._time)
+
+        # keeps everything on the connection, as execute() always has
+        self.response = result.response
+        self._response_error = result.response_error
+        self._response_content = result.response.content
+        self._set_resp_body_errors(result.body_errors)
+
+        self._raise_for_result(result)
 
         return self.response
 
+    def _overrides_execute_steps(self):
+        """True if the class has no error_extractor or overrides one of the
+        methods execute() has always gone through. execute() then calls
+        them instead of taking the stateless steps of call().
+        """
+
+        if self.error_extractor is None:
+            return True
+
+        cls = type(self)
+        return any(getattr(cls, name) is not getattr(BaseConnection, name)
+                   for name in ('execute_request', 'process_response',
+                                'error_check', 'error', '_get_resp_body_errors'))
+
+    def _call_result(self, verb, request, request_id, response, list_nodes,
+                     materialize, fields, started, parse_response=True):
+        "Processes the requests.Response into a CallResult, never touching self."
+
+        response = self._build_response(response, verb, list_nodes,
+                                        materialize, fields, parse_response)
+
+        response_error = None
+        if response.status_code != 200:
+            response_error = response.reason
+
+        body_errors = self._check_resp_body_errors(verb, response)
+
+        response.release()
+
+        elapsed = time.time() - started
+        log.debug('total time=%s' % elapsed)
+
+        return CallResult(verb, request, request_id, response, response_error,
+                          body_errors, started, elapsed)
+
+    def _raise_for_result(self, result):
+        estr = result.error()
+
+        if estr and self.config.get('errors', True):
+            log.error(estr)
+            raise ConnectionError(estr, result.response)
+
     def build_request(self, verb, data, verb_attrs, files=None):
 
         self.verb = verb
         self._request_dict = data
-        self._request_id = uuid.uuid4()
+        self.request, self._request_id = self._prepare_request(
+            verb, data, verb_attrs, files)
+
+    def _prepare_request(self, verb, data, verb_attrs, files=None):
+        "Returns the requests.PreparedRequest and its id, never touching self."
 
-        url = self.build_request_url(verb)
+        request_id = uuid.uuid4()
 
-        headers = self.build_request_headers(verb)
-        headers.update({'User-Agent': UserAgent,
-                        'X-EBAY-SDK-REQUEST-ID': str(self._request_id)})
+        url = self._get_request_url(verb)
+
+        headers = dict(self._get_request_headers(verb))
+        headers['X-EBAY-SDK-REQUEST-ID'] = str(request_id)
 
         # if we are adding files, we ensure there is no Content-Type header already defined
         # otherwise Request will use the existing one which is likely not to be multipart/form-data
         # data must also be a dict so we make it so if needed
 
-        requestData = self.build_request_data(verb, data, verb_attrs)
+        if isinstance(data, RequestBody):
+            if data.verb != verb:
+                raise ValueError('request body compiled for %s, not %s'
+                                 % (data.verb, verb))
+            requestData = data.body
+        elif self.stream_request:
+            requestData = self.iter_request_data(verb, data, verb_attrs)
+        else:
+            requestData = self.build_request_data(verb, data, verb_attrs)
+
         if files:
             del(headers['Content-Type'])
-            if isinstance(requestData, str):  # pylint: disable-msg=E0602
+            if self.stream_request:
+                boundary = choose_boundary()
+                headers['Content-Type'] = 'multipart/form-data; boundary=%s' % boundary
+                requestData = iter_multipart({'XMLPayload': requestData}, files, boundary)
+                files = None
+            elif isinstance(requestData, (str, bytes)):  # pylint: disable-msg=E0602
                 requestData = {'XMLPayload': requestData}
 
         request = Request(self.method,
@@ -159,7 +998,48 @@ class BaseConnection(object):
                           files=files,
                           )
 
-        self.request = request.prepare()
+        return request.prepare(), request_id
+
+    def iter_request_data(self, verb, data, verb_attrs):
+        """Generator version of build_request_data(), used instead of it
+        when the connection is created with stream_request=True.
+
+        Yields the body utf-8 encoded, in chunks of about
+        REQUEST_CHUNK_SIZE bytes, and it is sent with chunked transfer
+        encoding. The envelope comes from build_request_data().
+        """
+
+        envelope = self.build_request_data(verb, REQUEST_BODY_MARKER, verb_attrs)
+        if REQUEST_BODY_MARKER not in envelope:
+            yield smart_encode_request_data(envelope)
+            return
+
+        head, tail = envelope.split(REQUEST_BODY_MARKER, 1)
+
+        yield smart_encode_request_data(head)
+        for chunk in iter_dict2xml(data, self.escape_xml, self.preserve_order,
+                                   self.request_namespace, REQUEST_CHUNK_SIZE):
+            yield chunk
+        yield smart_encode_request_data(tail)
+
+    def compile_request(self, verb, shape, verb_attrs=None):
+        """Compiles a request dict into a RequestTemplate.
+
+        Leaves of shape that change per call are given as
+        ebaysdk.utils.Slot('name'). The template serializes the shape
+        once, render() then only fills in the slots and the result is
+        passed to execute() as data:
+
+            t = api.compile_request('GetItem', {'ItemID': Slot('item_id')})
+            api.execute('GetItem', t.render(item_id='262809803926'))
+
+        Slot values are always escaped. Everything else, including the
+        credentials in the envelope, is fixed when compiling.
+        """
+
+        return RequestTemplate(
+            shape, lambda data: self.build_request_data(verb, data, verb_attrs),
+            verb=verb)
 
     def build_request_headers(self, verb):
         return {}
@@ -175,45 +1055,84 @@ class BaseConnection(object):
         )
         return url
 
-    def execute_request(self):
-
-        log.debug("REQUEST (%s): %s %s"
-                  % (self._request_id, self.request.method, self.request.url))
-        log.debug('headers=%s' % self.request.headers)
-        log.debug('body=%s' % self.request.body)
+    def execute_request(self, stream=False):
 
         if self.parallel:
+            self._log_request(self.request, self._request_id)
             self.parallel._add_request(self)
             return None
 
-        self.response = self.session.send(self.request,
-                                          verify=True,
-                                          proxies=self.proxies,
-                                          timeout=self.timeout,
-                                          allow_redirects=True
-                                          )
+        self.response = self._send_request(self.request, self._request_id, stream)
 
-        log.debug('RESPONSE (%s):' % self._request_id)
-        log.debug('elapsed time=%s' % self.response.elapsed)
-        log.debug('status code=%s' % self.response.status_code)
-        log.debug('headers=%s' % self.response.headers)
-        log.debug('content=%s' % self.response.text)
+    def _log_request(self, request, request_id):
+        log.debug("REQUEST (%s): %s %s"
+                  % (request_id, request.method, request.url))
+        log.debug('headers=%s' % request.headers)
+        log.debug('body=%s' % request.body)
+
+    def _send_request(self, request, request_id, stream=False):
+        "Sends the request and returns the requests.Response."
+
+        self._log_request(request, request_id)
+
+        response = self._get_session(request.url).send(request,
+                                                       verify=self.verify,
+                                                       proxies=self.proxies,
+                                                       timeout=self.timeout,
+                                                       allow_redirects=True,
+                                                       stream=stream
+                                                       )
 
-    def process_response(self, parse_response=True):
+        log.debug('RESPONSE (%s):' % request_id)
+        log.debug('elapsed time=%s' % response.elapsed)
+        log.debug('status code=%s' % response.status_code)
+        log.debug('headers=%s' % response.headers)
+        if not stream and log.isEnabledFor(logging.DEBUG):
+            log.debug('content=%s' % response.text)
+
+        return response
+
+    def process_response(self, parse_response=True, stream_nodes=None):
         """Post processing of the response"""
 
-        self.response = Response(self.response,
-                                 verb=self.verb,
-                                 list_nodes=self._list_nodes,
-                                 datetime_nodes=self.datetime_nodes,
-                                 parse_response=parse_response)
+        self.response = self._build_response(
+            self.response, self.verb, self._list_nodes, self._materialize,
+            self._fields, parse_response, stream_nodes)
+
+        if self.response.status_code != 200:
+            self._response_error = self.response.reason
+
+        if stream_nodes:
+            return
 
-        self.session.close()
         # set for backward compatibility
         self._response_content = self.response.content
 
-        if self.response.status_code != 200:
-            self._response_error = self.response.reason
+    def _iter_response(self):
+        "Yields the streamed nodes of the response, then checks for errors."
+
+        try:
+            for node in self.response.iter_nodes():
+                yield node
+        finally:
+            # hands the connection back to the pool
+            self.response.close()
+
+        self.error_check()
+
+    def _build_response(self, response, verb, list_nodes, materialize, fields,
+                        parse_response=True, stream_nodes=None):
+
+        return Response(response,
+                        verb=verb,
+                        list_nodes=list_nodes,
+                        datetime_nodes=self._get_datetime_nodes(),
+                        parse_response=parse_response,
+                        stream_nodes=stream_nodes,
+                        lazy_reply=self.lazy_reply,
+                        materialize=materialize,
+                        fields=fields,
+                        parser_options=self._get_parser_options())
 
     def error_check(self):
         estr = self.error()
@@ -302,28 +1221,94 @@ class BaseConnection(object):
 
         return self.response.json()
 
+    def error_records(self):
+        "Returns the ErrorRecords (errors and warnings) of the response."
+
+        self._get_resp_body_errors()
+        return self._resp_body_error_records
+
     def _get_resp_body_errors(self):
         """Parses the response content to pull errors.
 
-        Child classes should override this method based on what the errors in the
-        XML response body look like. They can choose to look at the 'ack',
-        'Errors', 'errorMessage' or whatever other fields the service returns.
-        the implementation below is the original code that was part of error()
+        Child classes describe what the errors in the XML response body look
+        like with error_extractor (see ErrorExtractor), or override this
+        method. When the dom isn't built, the raw payload is checked for
+        the error element first, so successful calls never parse it.
         """
 
         if self._resp_body_errors and len(self._resp_body_errors) > 0:
             return self._resp_body_errors
 
+        if self.verb is None:
+            return []
+
+        body_errors = self._check_resp_body_errors(self.verb, self.response)
+        self._set_resp_body_errors(body_errors)
+
+        return body_errors.failures
+
+    def _set_resp_body_errors(self, body_errors):
+        self._resp_body_warnings = body_errors.warnings
+        self._resp_body_errors = body_errors.errors
+        self._resp_body_error_records = body_errors.records
+        self._resp_codes = body_errors.codes
+
+    def _check_resp_body_errors(self, verb, response):
+        "Returns the ResponseErrors of the response, never touching self."
+
         errors = []
+        warnings = []
+        resp_codes = []
+        records = []
 
-        if self.verb is None:
-            return errors
+        dom = None
+        extractor = self.error_extractor
+
+        if verb is not None and extractor is not None and (
+                response.has_dom() or response.raw_contains(extractor.marker)):
+            dom = response.dom()
+            if dom is not None:
+                records = extractor.records(dom)
+
+        for r in records:
+            if r.code is not None and r.code not in resp_codes:
+                resp_codes.append(r.code)
+
+            if r.severity == 'Warning':
+                warnings.append(r.message)
+            else:
+                errors.append(r.message)
+
+        if self.config.get('warnings') and len(warnings) > 0:
+            log.warning("%s: %s\n\n" % (verb, "\n".join(warnings)))
+
+        failures = self._get_resp_body_failures(verb, extractor, dom, errors)
+
+        return ResponseErrors(errors, warnings, records, resp_codes, failures)
+
+    def _get_resp_body_failures(self, verb, extractor, dom, errors):
+        "Returns the errors the call fails with, which depends on the Ack."
 
-        dom = self.response.dom()
-        if dom is None:
-            return errors
+        if not errors:
+            return []
 
-        return []
+        ack = extractor.ack(dom)
+
+        if extractor.ack_success:
+            if ack is None:
+                return errors if extractor.missing_ack_fails else []
+
+            if ack == 'Success' and self.config.get('errors'):
+                log.error("%s: %s\n\n" % (verb, "\n".join(errors)))
+                return []
+
+        elif ack != 'Failure':
+            return []
+
+        if self.config.get('errors'):
+            log.error("%s: %s\n\n" % (verb, "\n".join(errors)))
+
+        return errors
 
     def error(self):
         "Builds and returns the api error message."
@@ -334,15 +1319,7 @@ class BaseConnection(object):
 
         error_array.extend(self._get_resp_body_errors())
 
-        if len(error_array) > 0:
-            # Force all errors to be unicode in a proper way
-            error_array = [smart_decode(smart_encode(e)) for e in error_array]
-            error_string = u"{verb}: {message}".format(
-                verb=self.verb, message=u", ".join(error_array))
-
-            return error_string
-
-        return None
+        return format_error(self.verb, error_array)
 
     def opendoc(self):
         webbrowser.open(self.config.get('doc_url'))
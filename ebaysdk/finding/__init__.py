@@ -6,13 +6,13 @@ Authored by: Tim Keefer
 Licensed under CDDL 1.0
 '''
 
+import copy
 import os
 
-from ebaysdk import log
-from ebaysdk.connection import BaseConnection
+from ebaysdk.connection import BaseConnection, ErrorExtractor
 from ebaysdk.exception import RequestPaginationError, PaginationLimit
 from ebaysdk.config import Config
-from ebaysdk.utils import dict2xml
+from ebaysdk.utils import dict2xml, Slot
 
 
 class Connection(BaseConnection):
@@ -177,6 +177,8 @@ class Connection(BaseConnection):
             'finditemsinebaystoresresponse.shippinginfo.shiptolocations',
         ]
 
+        self._page_call = (None, None, None)
+
     def build_request_headers(self, verb):
         return {
             "X-EBAY-SOA-SERVICE-NAME": self.config.get('service', ''),
@@ -192,7 +194,7 @@ class Connection(BaseConnection):
     def build_request_data(self, verb, data, verb_attrs):
         xml = "<?xml version='1.0' encoding='utf-8'?>"
         xml += "<" + verb + "Request xmlns=\"http://www.ebay.com/marketplace/search/v1/services\">"
-        xml += dict2xml(data, self.escape_xml)
+        xml += dict2xml(data, self.escape_xml, self.preserve_order)
         xml += "</" + verb + "Request>"
 
         return xml
@@ -206,85 +208,11 @@ class Connection(BaseConnection):
 
         return warning_string
 
-    def _get_resp_body_errors(self):
-        """Parses the response content to pull errors.
-
-        Child classes should override this method based on what the errors in the
-        XML response body look like. They can choose to look at the 'ack',
-        'Errors', 'errorMessage' or whatever other fields the service returns.
-        the implementation below is the original code that was part of error()
-        """
-
-        if self._resp_body_errors and len(self._resp_body_errors) > 0:
-            return self._resp_body_errors
-
-        errors = []
-        warnings = []
-        resp_codes = []
-
-        if self.verb is None:
-            return errors
-
-        dom = self.response.dom()
-        if dom is None:
-            return errors
-
-        for e in dom.findall("error"):
-            eSeverity = None
-            eDomain = None
-            eMsg = None
-            eId = None
-
-            try:
-                eSeverity = e.findall('severity')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eDomain = e.findall('domain')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eId = e.findall('errorId')[0].text
-                if int(eId) not in resp_codes:
-                    resp_codes.append(int(eId))
-            except IndexError:
-                pass
-
-            try:
-                eMsg = e.findall('message')[0].text
-            except IndexError:
-                pass
-
-            msg = "Domain: %s, Severity: %s, errorId: %s, %s" \
-                % (eDomain, eSeverity, eId, eMsg)
-
-            if eSeverity == 'Warning':
-                warnings.append(msg)
-            else:
-                errors.append(msg)
-
-        self._resp_body_warnings = warnings
-        self._resp_body_errors = errors
-        self._resp_codes = resp_codes
-
-        if self.config.get('warnings') and len(warnings) > 0:
-            log.warning("%s: %s\n\n" % (self.verb, "\n".join(warnings)))
-
-        try:
-            if self.response.reply.ack == 'Success' and len(errors) > 0 and self.config.get('errors'):
-                log.error("%s: %s\n\n" % (self.verb, "\n".join(errors)))
-
-            elif len(errors) > 0:
-                if self.config.get('errors'):
-                    log.error("%s: %s\n\n" % (self.verb, "\n".join(errors)))
-
-                return errors
-        except AttributeError as e:
-            return errors
-
-        return []
+    error_extractor = ErrorExtractor(
+        'error', ('severity', 'domain', 'errorId', 'message'),
+        severity='severity', code='errorId',
+        message="Domain: {domain}, Severity: {severity}, errorId: {errorId}, {message}",
+        ack='ack', ack_success=True)
 
     def next_page(self):
         if type(self._request_dict) is not dict:
@@ -306,4 +234,27 @@ class Connection(BaseConnection):
 
         self._request_dict['paginationInput']['pageNumber'] = int(num) + 1
 
-        return self.execute(self.verb, self._request_dict)
+        return self.execute_prepared(self._get_page_call(epp),
+                                     {'page': int(num) + 1}, self._request_dict)
+
+    def _get_page_call(self, epp):
+        """Returns the PreparedCall next_page() sends for the request dict,
+        reused for as long as the verb and the rest of the dict stay the same.
+        """
+
+        rest = dict((k, v) for k, v in self._request_dict.items()
+                    if k != 'paginationInput')
+        verb, key, call = self._page_call
+
+        if verb != self.verb or key != (epp, rest):
+            pagination = {}
+            if epp:
+                pagination['enteriesPerPage'] = epp
+            pagination['pageNumber'] = Slot('page')
+
+            shape = dict(self._request_dict)
+            shape['paginationInput'] = pagination
+            call = self.prepare_call(self.verb, shape)
+            self._page_call = (self.verb, (epp, copy.deepcopy(rest)), call)
+
+        return call
@@ -101,8 +101,8 @@ class Connection(BaseConnection):
         self.build_request(url, data, headers)
         self.execute_request()
 
+        # queued by execute_request()
         if self.parallel:
-            self.parallel._add_request(self)
             return None
 
         self.process_response(parse_response=parse_response)
@@ -112,26 +112,47 @@ class Connection(BaseConnection):
 
         return self.response
 
+    def execute_async(self, url, data=None, headers=dict(), method=None,
+                      parse_response=True, session=None, offload=False):
+        """Coroutine version of execute(), see BaseConnection.execute_async().
+
+        Returns a CallResult and leaves the connection alone.
+        """
+        from ebaysdk import aio
+
+        started = time.time()
+
+        request, request_id = self._prepare_request(
+            url, data, dict(headers), method or self.method)
+        return aio.execute(self, None, request, request_id, frozenset(),
+                           self.materialize, None, started,
+                           parse_response=parse_response, session=session,
+                           offload=offload)
+
     def build_request(self, url, data, headers):
 
-        self._request_id = uuid.uuid4()
+        self.request, self._request_id = self._prepare_request(
+            url, data, headers, self.method)
+
+    def _prepare_request(self, url, data, headers, method):
+        request_id = uuid.uuid4()
 
         headers.update({'User-Agent': UserAgent,
-                        'X-EBAY-SDK-REQUEST-ID': str(self._request_id)})
+                        'X-EBAY-SDK-REQUEST-ID': str(request_id)})
 
         kw = dict()
-        if self.method == 'POST':
+        if method == 'POST':
             kw['data'] = data
         else:
             kw['params'] = data
 
-        request = Request(self.method,
+        request = Request(method,
                           url,
                           headers=headers,
                           **kw
                           )
 
-        self.request = request.prepare()
+        return request.prepare(), request_id
 
     def warnings(self):
         return ''
@@ -7,11 +7,16 @@ Licensed under CDDL 1.0
 
 import os
 
-from ebaysdk import log
-from ebaysdk.connection import BaseConnection
+from ebaysdk.connection import BaseConnection, ErrorExtractor
 from ebaysdk.exception import ConnectionError
 from ebaysdk.config import Config
-from ebaysdk.utils import dict2xml, smart_encode
+from ebaysdk.utils import dict2xml
+
+
+def error_code(code):
+    "Error code 0 isn't a code"
+
+    return int(code) or None
 
 
 class Connection(BaseConnection):
@@ -192,7 +197,7 @@ class Connection(BaseConnection):
     def build_request_data(self, verb, data, verb_attrs):
         xml = "<?xml version=\"1.0\" encoding=\"utf-8\"?>"
         xml += "<{verb}Request>".format(verb=verb)
-        xml += dict2xml(data, self.escape_xml)
+        xml += dict2xml(data, self.escape_xml, self.preserve_order)
         xml += "</{verb}Request>".format(verb=verb)
 
         return xml
@@ -206,110 +211,13 @@ class Connection(BaseConnection):
 
         return warning_string
 
-    def _get_resp_body_errors(self):
-        """Parses the response content to pull errors.
-
-        Child classes should override this method based on what the errors in the
-        XML response body look like. They can choose to look at the 'ack',
-        'Errors', 'errorMessage' or whatever other fields the service returns.
-        the implementation below is the original code that was part of error()
-        """
-
-        if self._resp_body_errors and len(self._resp_body_errors) > 0:
-            return self._resp_body_errors
-
-        errors = []
-        warnings = []
-        resp_codes = []
-
-        if self.verb is None:
-            return errors
-
-        dom = self.response.dom()
-
-        if dom is None:
-            return errors
-
-        # In special case we get errors in this format...
-        if not dom.findall('Errors') and dom.find('Body') is not None:
-            dom = dom.find('Body').find('Response')
-
-        if dom is None:
-            return errors
-
-        for e in dom.findall('Errors'):
-            eSeverity = None
-            eClass = None
-            eShortMsg = None
-            eLongMsg = None
-            eCode = None
-
-            try:
-                eSeverity = e.findall('SeverityCode')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eClass = e.findall('ErrorClassification')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eCode = e.findall('ErrorCode')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eShortMsg = e.findall('ShortMessage')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eLongMsg = e.findall('LongMessage')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eCode = e.findall('ErrorCode')[0].text
-                try:
-                    int_code = int(eCode)
-                except ValueError:
-                    int_code = None
-
-                if int_code and int_code not in resp_codes:
-                    resp_codes.append(int_code)
-
-            except IndexError:
-                pass
-
-            msg = "Class: {eClass}, Severity: {severity}, Code: {code}, {shortMsg} {longMsg}" \
-                .format(eClass=eClass, severity=eSeverity, code=eCode, shortMsg=smart_encode(eShortMsg),
-                        longMsg=smart_encode(eLongMsg))
-
-            if eSeverity == 'Warning':
-                warnings.append(msg)
-            else:
-                errors.append(msg)
-
-        self._resp_body_warnings = warnings
-        self._resp_body_errors = errors
-        self._resp_codes = resp_codes
-
-        if self.config.get('warnings') and len(warnings) > 0:
-            log.warning("{verb}: {message}\n\n".format(
-                verb=self.verb, message="\n".join(warnings)))
-
-        # In special case of error 500 on ebay side, we get really weird
-        # response so I need to fallback to this one
-        Ack = getattr(self.response.reply, 'Ack', None)
-        if Ack is None:
-            Ack = self.response.reply.Envelope.Body.Response.Ack
-
-        if Ack == 'Failure':
-            if self.config.get('errors'):
-                log.error("{verb}: {message}\n\n".format(
-                    verb=self.verb, message="\n".join(errors)))
-
-            return errors
-
-        return []
+    # In special case of error 500 on ebay side, we get really weird
+    # response, with the errors wrapped in a soap envelope
+    error_extractor = ErrorExtractor(
+        ('Errors', 'Body/Response/Errors'),
+        ('SeverityCode', 'ErrorClassification', 'ErrorCode', 'ShortMessage', 'LongMessage'),
+        severity='SeverityCode', code='ErrorCode', code_type=error_code,
+        encode=('ShortMessage', 'LongMessage'),
+        message="Class: {ErrorClassification}, Severity: {SeverityCode}, "
+                "Code: {ErrorCode}, {ShortMessage} {LongMessage}",
+        ack=('Ack', 'Body/Response/Ack'))
@@ -87,7 +87,7 @@ class Connection(FindingConnection):
     def build_request_data(self, verb, data, verb_attrs):
         xml = "<?xml version='1.0' encoding='utf-8'?>"
         xml += "<" + verb + "Request xmlns=\"http://www.ebay.com/marketplace/services\">"
-        xml += dict2xml(data, self.escape_xml)
+        xml += dict2xml(data, self.escape_xml, self.preserve_order)
         xml += "</" + verb + "Request>"
 
         return xml
@@ -6,11 +6,195 @@ Authored by: Tim Keefer
 Licensed under CDDL 1.0
 '''
 
+import threading
+
+from collections import deque
+from concurrent import futures
+
 from ebaysdk.exception import ConnectionError
 
-# pylint: disable=import-error
-import grequests
-# pylint: enable=import-error
+
+def _send(connection):
+    "Sends the queued request of a connection, see Backend.send()."
+
+    try:
+        return connection, connection._send_request(
+            connection.request, connection._request_id), None
+    except Exception as e:
+        return connection, None, e
+
+
+def _send_futures(submit, connections, limit):
+    """Backend.send() for backends whose submit(connection) returns a
+    concurrent.futures.Future of the requests.Response.
+    """
+
+    connections = iter(connections)
+    pending = dict()
+
+    try:
+        while True:
+            while len(pending) < limit:
+                connection = next(connections, None)
+                if connection is None:
+                    break
+
+                pending[submit(connection)] = connection
+
+            if not pending:
+                return
+
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+
+            for future in done:
+                connection = pending.pop(future)
+
+                exception = future.exception()
+                if exception is not None:
+                    yield connection, None, exception
+                else:
+                    yield connection, future.result(), None
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class Backend(object):
+    """Sends the requests queued in a Parallel.
+
+    At most limit requests are in flight at once.
+    """
+
+    def __init__(self, limit=10):
+        self.limit = limit
+
+    def send(self, connections, limit=None):
+        """Sends the queued request of each connection.
+
+        Yields (connection, response, exception) as each request completes,
+        exception being None unless the request could not be sent. The
+        connections are taken from the iterable one at a time, only once
+        fewer than limit (default: self.limit) requests are in flight.
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ThreadBackend(Backend):
+    """Sends the requests from a concurrent.futures thread pool of limit
+    threads, through the sessions of the connections.
+
+    The default backend. Connections keep pool_maxsize (default: 10)
+    connections alive per endpoint, a larger limit opens more than are
+    kept.
+    """
+
+    def __init__(self, limit=10):
+        super(ThreadBackend, self).__init__(limit)
+        self._executor = None
+
+    def send(self, connections, limit=None):
+        return _send_futures(self._submit, connections, limit or self.limit)
+
+    def _submit(self, connection):
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(max_workers=self.limit)
+
+        return self._executor.submit(connection._send_request,
+                                     connection.request, connection._request_id)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class GeventBackend(Backend):
+    """Sends the requests from a gevent pool of limit greenlets, through
+    the sessions of the connections.
+
+    Needs gevent. Like grequests, it monkey patches the standard library,
+    which is best done with gevent.monkey.patch_all() before anything
+    else is imported.
+    """
+
+    def __init__(self, limit=10):
+        super(GeventBackend, self).__init__(limit)
+
+        # pylint: disable=import-error
+        from gevent import monkey
+        # pylint: enable=import-error
+
+        if not monkey.is_module_patched('socket'):
+            monkey.patch_all(thread=False, select=False)
+
+    def send(self, connections, limit=None):
+        # pylint: disable=import-error
+        from gevent.pool import Pool
+        # pylint: enable=import-error
+
+        limit = limit or self.limit
+
+        return Pool(limit).imap_unordered(_send, connections, maxsize=limit)
+
+
+class AsyncioBackend(Backend):
+    """Sends the requests with aiohttp, from an event loop in a thread of
+    its own, see ebaysdk.aio.
+
+    Needs aiohttp. The loop and its client session are kept until
+    close(), so connections stay alive between calls to Parallel.wait().
+    """
+
+    def __init__(self, limit=10):
+        super(AsyncioBackend, self).__init__(limit)
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                import asyncio
+
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever,
+                                          name='ebaysdk-asyncio')
+                thread.daemon = True
+                thread.start()
+
+                self._loop = (loop, thread)
+
+            return self._loop[0]
+
+    def send(self, connections, limit=None):
+        return _send_futures(self._submit, connections, limit or self.limit)
+
+    def _submit(self, connection):
+        import asyncio
+        from ebaysdk import aio
+
+        return asyncio.run_coroutine_threadsafe(
+            aio.send(connection, connection.request, connection._request_id),
+            self._get_loop())
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+
+            import asyncio
+            from ebaysdk import aio
+
+            loop, thread = self._loop
+            self._loop = None
+
+        asyncio.run_coroutine_threadsafe(aio.close_sessions(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
 
 
 class Parallel(object):
@@ -37,51 +221,92 @@ class Parallel(object):
     Success
     """
 
-    def __init__(self):
-        self._grequests = []
-        self._requests = []
+    def __init__(self, backend=None):
+        """Parallel class constructor.
+
+        backend sends the requests (default: ThreadBackend()), also
+        GeventBackend() or AsyncioBackend(). Each takes the number of
+        requests in flight at once as limit (default: 10).
+        """
+
+        self.backend = backend or ThreadBackend()
+        self._requests = deque()
         self._errors = []
 
     def _add_request(self, request):
         self._requests.append(request)
 
     def wait(self, timeout=20):
-        "wait for all of the api requests to complete"
+        """wait for all of the api requests to complete
+
+        Each request times out after the timeout of its connection.
+        """
 
         self._errors = []
-        self._grequests = []
 
-        try:
-            for r in self._requests:
-                req = grequests.request(r.request.method,
-                                        r.request.url,
-                                        data=r.request.body,
-                                        headers=r.request.headers,
-                                        verify=False,
-                                        proxies=r.proxies,
-                                        timeout=r.timeout,
-                                        allow_redirects=True)
+        requests, self._requests = list(self._requests), deque()
+
+        results = dict()
+        for r, response, exception in self.backend.send(requests):
+            results[id(r)] = (response, exception)
 
-                self._grequests.append(req)
+        for r in requests:
+            response, exception = results[id(r)]
+            self._process(r, response, exception)
 
-            def exception_handler(request, exception):
-                self._errors.append("%s" % exception)
+    def as_completed(self, max_in_flight=None):
+        """Sends the queued requests and yields each connection as soon
+        as its response is processed, in the order they complete:
+
+            for api in p.as_completed(max_in_flight=50):
+                if not api.error():
+                    handle(api.response.reply)
+
+        At most max_in_flight requests (default: the limit of the
+        backend) are in flight or waiting to be yielded, and the next
+        request is only sent once a yielded connection is handed back,
+        so responses are never piling up however many are queued.
+        Connections queued while iterating are sent as well, the ones
+        not sent yet stay queued when iterating stops early.
+
+        Errors are collected for error() as by wait(). Connections whose
+        request could not be sent are not yielded.
+        """
+
+        self._errors = []
 
-            gresponses = grequests.map(
-                self._grequests, exception_handler=exception_handler)
+        while self._requests:
+            for r, response, exception in self.backend.send(
+                    self._iter_requests(), max_in_flight):
 
-            for idx, r in enumerate(self._requests):
-                r.response = gresponses[idx]
-                r.process_response()
-                r.error_check()
+                if self._process(r, response, exception):
+                    yield r
 
-                if r.error():
-                    self._errors.append(r.error())
+    def _iter_requests(self):
+        # drops each connection from the queue as it is sent
+        while self._requests:
+            yield self._requests.popleft()
 
+    def _process(self, r, response, exception):
+        "Processes the response of a connection, False if there is none."
+
+        if exception is not None:
+            self._errors.append("%s" % exception)
+            return False
+
+        r.response = response
+
+        try:
+            r.process_response()
+            r.error_check()
         except ConnectionError as e:
             self._errors.append("%s" % e)
+            return True
+
+        if r.error():
+            self._errors.append(r.error())
 
-        self._requests = []
+        return True
 
     def error(self):
         "builds and returns the api error message"
@@ -91,6 +316,17 @@ class Parallel(object):
 
         return None
 
+    def close(self):
+        "Closes the backend, see ThreadBackend and AsyncioBackend."
+
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
 
 if __name__ == '__main__':
 
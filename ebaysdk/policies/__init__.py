@@ -6,8 +6,7 @@ Authored by: Tim Keefer
 Licensed under CDDL 1.0
 '''
 
-from ebaysdk import log
-from ebaysdk.connection import BaseConnection
+from ebaysdk.connection import BaseConnection, ErrorExtractor
 from ebaysdk.config import Config
 from ebaysdk.utils import dict2xml
 
@@ -130,7 +129,7 @@ class Connection(BaseConnection):
         xml = "<?xml version='1.0' encoding='utf-8'?>"
         xml += "<{verb}Request xmlns=\"http://www.ebay.com/marketplace/selling/v1/services\">".format(
             verb=verb)
-        xml += dict2xml(data, self.escape_xml)
+        xml += dict2xml(data, self.escape_xml, self.preserve_order)
         xml += "</{verb}Request>".format(verb=verb)
 
         return xml
@@ -144,82 +143,8 @@ class Connection(BaseConnection):
 
         return warning_string
 
-    def _get_resp_body_errors(self):
-        """Parses the response content to pull errors.
-
-        Child classes should override this method based on what the errors in the
-        XML response body look like. They can choose to look at the 'ack',
-        'Errors', 'errorMessage' or whatever other fields the service returns.
-        the implementation below is the original code that was part of error()
-        """
-
-        if self._resp_body_errors and len(self._resp_body_errors) > 0:
-            return self._resp_body_errors
-
-        errors = []
-        warnings = []
-        resp_codes = []
-
-        if self.verb is None:
-            return errors
-
-        dom = self.response.dom()
-        if dom is None:
-            return errors
-
-        for e in dom.findall("error"):
-            eSeverity = None
-            eDomain = None
-            eMsg = None
-            eId = None
-
-            try:
-                eSeverity = e.findall('severity')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eDomain = e.findall('domain')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eId = e.findall('errorId')[0].text
-                if int(eId) not in resp_codes:
-                    resp_codes.append(int(eId))
-            except IndexError:
-                pass
-
-            try:
-                eMsg = e.findall('message')[0].text
-            except IndexError:
-                pass
-
-            msg = "Domain: %s, Severity: %s, errorId: %s, %s" \
-                % (eDomain, eSeverity, eId, eMsg)
-
-            if eSeverity == 'Warning':
-                warnings.append(msg)
-            else:
-                errors.append(msg)
-
-        self._resp_body_warnings = warnings
-        self._resp_body_errors = errors
-        self._resp_codes = resp_codes
-
-        if self.config.get('warnings') and len(warnings) > 0:
-            log.warning("%s: %s\n\n" % (self.verb, "\n".join(warnings)))
-
-        try:
-            if self.response.reply.ack == 'Success' and len(errors) > 0 and self.config.get('errors'):
-                log.error("%s: %s\n\n" % (self.verb, "\n".join(errors)))
-
-            elif len(errors) > 0:
-                if self.config.get('errors'):
-                    log.error("%s: %s\n\n" % (self.verb, "\n".join(errors)))
-
-                return errors
-        except AttributeError as e:
-            return errors
-
-        return []
+    error_extractor = ErrorExtractor(
+        'error', ('severity', 'domain', 'errorId', 'message'),
+        severity='severity', code='errorId',
+        message="Domain: {domain}, Severity: {severity}, errorId: {errorId}, {message}",
+        ack='ack', ack_success=True)
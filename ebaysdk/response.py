@@ -7,22 +7,32 @@ Licensed under CDDL 1.0
 '''
 import sys
 import lxml
-import copy
 import datetime
+from io import BytesIO
 from lxml.etree import XMLSyntaxError  # pylint: disable-msg=E0611
 
 from collections import defaultdict
 import json
 
-from ebaysdk.utils import get_dom_tree, python_2_unicode_compatible
+from ebaysdk.utils import get_dom_tree, get_parser, parse_datetime, python_2_unicode_compatible
 from ebaysdk import log
 
 
+class PreciseDatetimeNodes(frozenset):
+    """datetime_nodes whose timestamps keep their fractional seconds and
+    timezone, see ebaysdk.utils.parse_datetime(). With any other set they
+    are decoded naive and to the second.
+    """
+
+
 @python_2_unicode_compatible
 class ResponseDataObject(object):
 
-    def __init__(self, mydict, datetime_nodes=[]):
-        self._load_dict(mydict, list(datetime_nodes))
+    def __init__(self, mydict, datetime_nodes=frozenset()):
+        if not isinstance(datetime_nodes, frozenset):
+            datetime_nodes = frozenset(datetime_nodes)
+
+        self._load_dict(mydict, datetime_nodes)
 
     def __repr__(self):
         return str(self)
@@ -43,14 +53,29 @@ class ResponseDataObject(object):
         except AttributeError:
             return default
 
+    @staticmethod
+    def _to_datetime(value, datetime_nodes=frozenset()):
+        ts = parse_datetime(value)
+        if ts is not None:
+            if isinstance(datetime_nodes, PreciseDatetimeNodes):
+                return ts
+
+            # what strptime() below makes of it
+            if value[19:20] == '.' or ts.tzinfo is None:
+                return ts.replace(microsecond=0, tzinfo=None)
+
+            return value
+
+        try:
+            ts = "%s %s" % (value.partition(
+                'T')[0], value.partition('T')[2].partition('.')[0])
+            return datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return value
+
     def _setattr(self, name, value, datetime_nodes):
-        if name.lower() in datetime_nodes:
-            try:
-                ts = "%s %s" % (value.partition(
-                    'T')[0], value.partition('T')[2].partition('.')[0])
-                value = datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                pass
+        if name.lower() in datetime_nodes and hasattr(value, 'partition'):
+            value = self._to_datetime(value, datetime_nodes)
 
         setattr(self, name, value)
 
@@ -79,6 +104,121 @@ class ResponseDataObject(object):
                 self._setattr(a[0], a[1], datetime_nodes)
 
 
+class LazyResponseDataObject(ResponseDataObject):
+    """ResponseDataObject backed by an lxml element.
+
+    Child objects, lists and datetime conversions are only built when an
+    attribute is first accessed, and are cached on the object from then
+    on. When path is None the element itself is exposed as the single
+    attribute of the object, as Response does for unexpected root nodes.
+
+    >>> xml = b'<GetItemResponse><Ack>Success</Ack><Item><ItemID>1</ItemID><EndTime>2014-02-07T23:31:13.000Z</EndTime><PictureURL>a</PictureURL><Price currencyID="USD">1.0</Price></Item></GetItemResponse>'
+    >>> dom = get_dom_tree(xml)
+    >>> o = LazyResponseDataObject(dom, 'getitemresponse', frozenset(['getitemresponse.item.pictureurl']), ['endtime'])
+    >>> o.Ack
+    'Success'
+    >>> o.Item.PictureURL
+    ['a']
+    >>> o.Item.EndTime
+    datetime.datetime(2014, 2, 7, 23, 31, 13)
+    >>> o = LazyResponseDataObject(dom, 'getitemresponse', datetime_nodes=PreciseDatetimeNodes(['endtime']))
+    >>> o.Item.EndTime.isoformat()
+    '2014-02-07T23:31:13+00:00'
+    >>> o.Item.Price._currencyID, o.Item.Price.value
+    ('USD', '1.0')
+    >>> o.has_key('Errors'), o.get('Errors', 'none')
+    (False, 'none')
+    >>> o.Item is o.Item
+    True
+    """
+
+    def __init__(self, elem, path=None, list_nodes=frozenset(), datetime_nodes=frozenset()):
+        if not isinstance(datetime_nodes, frozenset):
+            datetime_nodes = frozenset(datetime_nodes)
+
+        self._lazy_elem = elem
+        self._lazy_path = path
+        self._lazy_list_nodes = list_nodes
+        self._lazy_datetime_nodes = datetime_nodes
+        self._lazy_keys = None
+
+    def __str__(self):
+        self._lazy_load_all()
+        return "%s" % dict((k, v) for k, v in self.__dict__.items()
+                           if not k.startswith('_lazy'))
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name.startswith('_lazy'):
+            raise AttributeError(name)
+
+        keys = self._lazy_index()
+        if name not in keys:
+            raise AttributeError(name)
+
+        self._lazy_load(name, keys.pop(name))
+        return self.__dict__[name]
+
+    def _lazy_index(self):
+        if self._lazy_keys is not None:
+            return self._lazy_keys
+
+        elem = self._lazy_elem
+        keys = dict()
+
+        if self._lazy_path is None:
+            keys[elem.tag] = [elem]
+        else:
+            for child in elem:
+                if child.tag is lxml.etree.Comment:
+                    continue
+                keys.setdefault(child.tag, []).append(child)
+
+            keys.update(('_' + k, v) for k, v in elem.attrib.items())
+
+            text = elem.text.strip() if elem.text else None
+            if text:
+                keys['value'] = text
+
+        self._lazy_keys = keys
+        return keys
+
+    def _lazy_load(self, name, source):
+        if not isinstance(source, list):
+            self._setattr(name, source, self._lazy_datetime_nodes)
+            return
+
+        if self._lazy_path is None:
+            path = name.lower()
+            force_list = False
+        else:
+            path = "%s.%s" % (self._lazy_path, name.lower())
+            force_list = path in self._lazy_list_nodes
+
+        values = [self._lazy_value(e, path) for e in source]
+
+        if len(values) == 1 and not force_list:
+            if isinstance(values[0], ResponseDataObject):
+                setattr(self, name, values[0])
+            else:
+                self._setattr(name, values[0], self._lazy_datetime_nodes)
+        else:
+            setattr(self, name, values)
+
+    def _lazy_value(self, elem, path):
+        if len(elem) or elem.attrib:
+            return LazyResponseDataObject(elem, path, self._lazy_list_nodes,
+                                          self._lazy_datetime_nodes)
+        if elem.text:
+            return elem.text.strip()
+
+        return None
+
+    def _lazy_load_all(self):
+        keys = self._lazy_index()
+        for name in list(keys.keys()):
+            self._lazy_load(name, keys.pop(name))
+
+
 class Response(object):
     '''
     <?xml version='1.0' encoding='UTF-8'?>
@@ -133,53 +273,343 @@ class Response(object):
     True
     '''
 
-    def __init__(self, obj, verb=None, list_nodes=[], datetime_nodes=[], parse_response=True):
-        self._list_nodes = copy.copy(list_nodes)
+    MATERIALIZE = ('dom', 'dict', 'reply', 'raw')
+
+    def __init__(self, obj, verb=None, list_nodes=[], datetime_nodes=[],
+                 parse_response=True, stream_nodes=None, lazy_reply=False,
+                 materialize=None, fields=None, parser_options=None):
+        if isinstance(list_nodes, frozenset):
+            self._list_nodes = list_nodes
+        else:
+            self._list_nodes = frozenset(list_nodes)
+        if not isinstance(datetime_nodes, frozenset):
+            datetime_nodes = frozenset(datetime_nodes)
+
         self._obj = obj
+        self._verb = verb
+        self._datetime_nodes = datetime_nodes
+        self._lazy_reply = lazy_reply
+        self._materialize = self._get_materialize(materialize)
+        self._streaming = bool(stream_nodes)
+        self._stream_nodes = None
+        self._fields = self._get_fields(fields)
+        self._parser_options = parser_options or {}
+        self._dom = None
+        self._dict = None
+        self._reply = None
+
+        if stream_nodes:
+            # nothing is read until iter_nodes() is consumed
+            self._stream_nodes = frozenset(n.lower() for n in stream_nodes)
+            self._dict = {}
+            self.reply = ResponseDataObject({}, [])
+
+        elif parse_response:
+            if self._materialize.intersection(('dom', 'dict', 'reply')):
+                root = self._parse_root()
+                if root is not None:
+                    # the dom is kept for error checking until release()
+                    build = self._materialize.union(('dom',))
+
+                    # by default dict() is derived from the dom on first use
+                    if materialize is None:
+                        build = build.difference(('dict',))
 
-        if parse_response:
-            try:
-                self._dom = self._parse_xml(obj.content)
-                self._dict = self._etree_to_dict(self._dom)
-
-                if verb and 'Envelope' in self._dict.keys():
-                    elem = self._dom.find('Body').find('%sResponse' % verb)
-                    if elem is not None:
-                        self._dom = elem
-
-                    self._dict = self._dict['Envelope'][
-                        'Body'].get('%sResponse' % verb, self._dict)
-                elif verb:
-                    elem = self._dom.find('%sResponse' % verb)
-                    if elem is not None:
-                        self._dom = elem
-
-                    self._dict = self._dict.get(
-                        '%sResponse' % verb, self._dict)
-
-                self.reply = ResponseDataObject(self._dict,
-                                                datetime_nodes=copy.copy(datetime_nodes))
-            except XMLSyntaxError as e:
-                log.debug('response parse failed: %s' % e)
-                self._dom = self._parse_xml("<%sResponse>parse error <![CDATA[%s]]></%sResponse>" % (verb, e, verb))
-                self._dict = self._etree_to_dict(self._dom)
-                self.reply = ResponseDataObject({}, [])
+                    self._load(root, build)
 
         else:
             self.reply = ResponseDataObject({}, [])
 
-    def _get_node_path(self, t):
-        i = t
+    @property
+    def reply(self):
+        if self._reply is None:
+            root = self._parse_root(self._dom)
+            if root is not None:
+                self._load(root, ('reply',))
+
+        return self._reply
+
+    @reply.setter
+    def reply(self, value):
+        self._reply = value
+
+    def _get_materialize(self, materialize):
+        """Returns the set of representations to build up front and keep.
+
+        Anything left out (dom, dict or reply) is built from the raw
+        payload the first time it is asked for. The raw payload itself
+        always stays on the HTTP response, 'raw' on its own means nothing
+        is parsed up front. By default everything is kept, but dict() is
+        only derived from the dom the first time it is called.
+        """
+
+        if materialize is None:
+            return frozenset(self.MATERIALIZE)
+
+        if isinstance(materialize, str):
+            materialize = [materialize]
+
+        materialize = frozenset(materialize)
+        unknown = materialize.difference(self.MATERIALIZE)
+        if unknown:
+            raise ValueError('unknown materialize option(s): %s, expected %s'
+                             % (', '.join(sorted(unknown)), ', '.join(self.MATERIALIZE)))
+
+        return materialize
+
+    def _get_fields(self, fields):
+        """Returns the projected field paths, or None to keep everything.
+
+        Paths are relative to the response element and case insensitive.
+        Returns the fields along with the paths leading up to them.
+
+        >>> xml = b'<GetOrdersResponse><Ack>Success</Ack><OrderArray><Order><OrderID>1</OrderID><Buyer>x</Buyer></Order></OrderArray><PageNumber>1</PageNumber></GetOrdersResponse>'
+        >>> o = ResponseDataObject({'content': xml}, [])
+        >>> r = Response(o, verb='GetOrders', fields=['OrderArray.Order.OrderID'])
+        >>> r.reply.Ack, r.reply.OrderArray.Order.OrderID
+        ('Success', '1')
+        >>> r.reply.has_key('PageNumber'), r.reply.OrderArray.Order.has_key('Buyer')
+        (False, False)
+        """
+
+        if not fields:
+            return None
+
+        if isinstance(fields, str):
+            fields = [fields]
+
+        fields = frozenset(f.lower() for f in fields)
+        parents = frozenset(f.rsplit('.', i)[0]
+                            for f in fields for i in range(1, f.count('.') + 1))
+
+        return fields, parents
+
+    def _parse_root(self, dom=None):
+        """Returns the document root, parsing the raw payload if needed.
+
+        Returns None if the payload is not well-formed, in which case the
+        parse error response has been loaded instead.
+        """
+
+        if dom is not None:
+            return dom.getroottree().getroot()
+
+        if self._streaming:
+            return None
+
+        try:
+            return self._parse_xml(self._obj.content)
+        except XMLSyntaxError as e:
+            self._load_parse_error(e, self._verb)
+            return None
+
+    def _load(self, root, materialize):
+        """Builds the requested representations from the document root."""
+
+        verb = self._verb
+
+        # the root element is exposed as is when there is no verb
+        # specific response element, see _reply_source()
+        if verb and root.tag == 'Envelope':
+            elem = root.find('Body').find('%sResponse' % verb)
+        elif verb:
+            elem = root.find('%sResponse' % verb)
+        else:
+            elem = None
+
+        if 'dom' in materialize:
+            self._dom = elem if elem is not None else root
+
+        mydict = None
+        if 'dict' in materialize:
+            mydict = self._etree_to_dict(root)
+
+            if verb and root.tag == 'Envelope':
+                mydict = mydict['Envelope']['Body'].get('%sResponse' % verb, mydict)
+            elif verb:
+                mydict = mydict.get('%sResponse' % verb, mydict)
+
+            self._dict = mydict
+
+        if 'reply' in materialize:
+            reply_elem, reply_path = self._reply_source(root)
+
+            if reply_path is not None and not len(reply_elem) and not reply_elem.attrib:
+                # a bare response element has no attributes to expose
+                if mydict is None:
+                    mydict = self._load(root, ('dict',))
+                self._reply = ResponseDataObject(mydict,
+                                                 datetime_nodes=self._datetime_nodes)
+            elif self._lazy_reply:
+                self._reply = LazyResponseDataObject(reply_elem, reply_path,
+                                                     self._list_nodes,
+                                                     self._datetime_nodes)
+            elif reply_path is None:
+                self._reply = ResponseDataObject({})
+                self._reply._setattr(
+                    root.tag, self._etree_to_reply(root, root.tag.lower()),
+                    self._datetime_nodes)
+            else:
+                self._reply = self._etree_to_reply(reply_elem, reply_path)
+
+        return mydict
+
+    def _reply_source(self, root):
+        "Returns the element and path the reply is built from."
+
+        verb = self._verb
+
+        if verb and root.tag == 'Envelope':
+            elem = root.find('Body').find('%sResponse' % verb)
+            if elem is not None:
+                return elem, 'envelope.body.%s' % elem.tag.lower()
+        elif verb and root.tag == '%sResponse' % verb:
+            return root, root.tag.lower()
+
+        return root, None
+
+    def _load_parse_error(self, e, verb):
+        log.debug('response parse failed: %s' % e)
+        self._dom = self._parse_xml("<%sResponse>parse error <![CDATA[%s]]></%sResponse>" % (verb, e, verb))
+        self._dict = self._etree_to_dict(self._dom)
+        self.reply = ResponseDataObject({}, [])
+
+    def has_dom(self):
+        "Tells whether the dom is built, without building it."
+
+        return self._dom is not None
+
+    def raw_contains(self, text):
+        """Checks the raw payload for text, e.g. an element name.
+
+        This is only a hint: it returns True whenever the payload can't be
+        checked (streamed responses and non ASCII compatible encodings), so
+        only a False can be relied upon.
+
+        >>> o = ResponseDataObject({'content': b'<GetItemResponse><Ack>Success</Ack></GetItemResponse>'}, [])
+        >>> r = Response(o, verb='GetItem')
+        >>> r.raw_contains('Errors'), r.raw_contains('Ack')
+        (False, True)
+        """
+
+        if self._stream_nodes:
+            return True
+
+        content = getattr(self._obj, 'content', None)
+        if content is None:
+            return True
+
+        if isinstance(content, bytes):
+            # UTF-16 and UTF-32 payloads hold NUL bytes up front
+            if b'\x00' in content[:4]:
+                return True
+
+            text = text.encode('ascii')
+
+        return text in content
+
+    def release(self):
+        """Drops the representations that were not asked for with materialize.
+
+        The connection calls this once error checking, which works on the
+        dom, is done.
+
+        >>> o = ResponseDataObject({'content': b'<findItemsAdvancedResponse><ack>Success</ack></findItemsAdvancedResponse>'}, [])
+        >>> r = Response(o, verb='findItemsAdvanced', materialize='reply')
+        >>> r.dom().tag
+        'findItemsAdvancedResponse'
+        >>> r.release()
+        >>> r._dom is None, r._dict is None
+        (True, True)
+        >>> r.reply.ack
+        'Success'
+        >>> r.dict()
+        {'ack': 'Success'}
+        >>> Response(o, materialize=['dom', 'xml'])
+        Traceback (most recent call last):
+        ...
+        ValueError: unknown materialize option(s): xml, expected dom, dict, reply, raw
+        """
+
+        if self._streaming:
+            return
+
+        if 'dom' not in self._materialize:
+            self._dom = None
+        if 'dict' not in self._materialize:
+            self._dict = None
+        if 'reply' not in self._materialize:
+            self._reply = None
+
+    def iter_nodes(self):
+        """Streams a response created with stream_nodes.
+
+        Yields a ResponseDataObject for every element whose dotted path,
+        relative to the response element (e.g. 'OrderArray.Order'),
+        matches one of the stream_nodes. Each element is dropped from the
+        tree once it has been yielded, so memory stays flat regardless of
+        the number of nodes. Once exhausted, dom(), dict() and reply hold
+        everything that was not streamed (Ack, Errors, pagination, ...).
+
+        >>> xml = b'<?xml version="1.0" encoding="UTF-8"?><GetOrdersResponse xmlns="urn:ebay:apis:eBLBaseComponents"><Ack>Success</Ack><OrderArray><Order><OrderID>1</OrderID><TransactionArray><Transaction><CreatedDate>2014-02-07T23:31:13.000Z</CreatedDate></Transaction></TransactionArray></Order><Order><OrderID>2</OrderID></Order></OrderArray><PageNumber>1</PageNumber></GetOrdersResponse>'
+        >>> o = ResponseDataObject({'content': xml}, [])
+        >>> r = Response(o, verb='GetOrders', stream_nodes=['OrderArray.Order'], datetime_nodes=['createddate'],
+        ...              list_nodes=['getordersresponse.orderarray.order.transactionarray.transaction'])
+        >>> orders = list(r.iter_nodes())
+        >>> [order.OrderID for order in orders]
+        ['1', '2']
+        >>> orders[0].TransactionArray.Transaction[0].CreatedDate
+        datetime.datetime(2014, 2, 7, 23, 31, 13)
+        >>> r.reply.Ack
+        'Success'
+        >>> sorted(r.dict().keys())
+        ['Ack', 'OrderArray', 'PageNumber']
+        """
+
+        raw = getattr(self._obj, 'raw', None)
+        if raw is not None and hasattr(raw, 'read'):
+            raw.decode_content = True
+            source = raw
+        else:
+            source = BytesIO(self._obj.content)
+
         path = []
-        path.insert(0, i.tag)
-        while 1:
-            try:
-                path.insert(0, i.getparent().tag)
-                i = i.getparent()
-            except AttributeError:
-                break
+        offset = 1
+
+        try:
+            for event, elem in lxml.etree.iterparse(  # pylint: disable=no-member
+                    source, events=('start', 'end'), **self._parser_options):
+
+                if event == 'start':
+                    path.append(self._get_node_tag(elem).lower())
+
+                    # SOAP responses are wrapped in Envelope and Body
+                    if len(path) == 1 and path[0] == 'envelope':
+                        offset = 3
+
+                    continue
+
+                # remove xmlns from nodes, see _parse_xml()
+                elem.tag = self._get_node_tag(elem)
+
+                if '.'.join(path[offset:]) in self._stream_nodes:
+                    value = self._etree_to_reply(elem, '.'.join(path))
+
+                    elem.clear()
+                    elem.getparent().remove(elem)
 
-        return '.'.join(path)
+                    yield value
+
+                path.pop()
+
+            # the stream can not be read again, so everything is built
+            self._streaming = False
+            self._materialize = frozenset(self.MATERIALIZE)
+            self._load(elem.getroottree().getroot(), self._materialize)
+
+        except XMLSyntaxError as e:
+            self._streaming = False
+            self._load_parse_error(e, self._verb)
 
     @staticmethod
     def _pullval(v):
@@ -188,31 +618,38 @@ class Response(object):
         else:
             return v
 
-    def _etree_to_dict(self, t):
+    def _etree_to_dict(self, t, parent_path=None):
+        """Converts the element into a dict.
+
+        The lowercased dotted path of each node is carried down the
+        recursion, so forced list lookups never have to walk back up the
+        tree. The tree itself is left untouched.
+        """
+
         if type(t) == lxml.etree._Comment:  # pylint: disable=no-member
             return {}
 
-        # remove xmlns from nodes, I find them meaningless
-        t.tag = self._get_node_tag(t)
+        if parent_path is None:
+            path = t.tag.lower()
+        else:
+            path = "%s.%s" % (parent_path, t.tag.lower())
 
         d = {t.tag: {} if t.attrib else None}
         children = list(t)
         if children:
             dd = defaultdict(list)
-            for dc in map(self._etree_to_dict, children):
-                for k, v in dc.items():
+            for child in children:
+                for k, v in self._etree_to_dict(child, path).items():
                     dd[k].append(v)
 
             d = {t.tag: dict((k, self._pullval(v)) for k, v in dd.items())}
-            # d = {t.tag: {k:v[0] if len(v) == 1 else v for k, v in dd.items()}}
 
-            # TODO: Optimizations? Forces a node to type list
-            parent_path = self._get_node_path(t)
-            for k in d[t.tag].keys():
-                path = "%s.%s" % (parent_path, k)
-                if path.lower() in self._list_nodes:
-                    if not isinstance(d[t.tag][k], list):
-                        d[t.tag][k] = [d[t.tag][k]]
+            # forces a node to type list
+            if self._list_nodes:
+                for k in d[t.tag].keys():
+                    if "%s.%s" % (path, k.lower()) in self._list_nodes:
+                        if not isinstance(d[t.tag][k], list):
+                            d[t.tag][k] = [d[t.tag][k]]
 
         if t.attrib:
             d[t.tag].update(('_' + k, v) for k, v in t.attrib.items())
@@ -225,23 +662,154 @@ class Response(object):
                 d[t.tag] = text
         return d
 
+    def _etree_to_reply(self, t, path):
+        """Converts the element straight into its reply value.
+
+        Gives the same result as building a ResponseDataObject from
+        _etree_to_dict(), without the intermediate dict. Elements with
+        children or attributes become ResponseDataObjects, anything else
+        is returned as its stripped text (or None).
+        """
+
+        attrs = t.items()
+        if not attrs and not len(t):
+            return t.text.strip() if t.text else None
+
+        items = dict()
+        paths = dict()
+        for child in t:
+            if child.tag is lxml.etree.Comment:
+                continue
+
+            tag = child.tag
+
+            if tag in items:
+                child_path = paths[tag]
+            else:
+                child_path = paths[tag] = "%s.%s" % (path, tag.lower())
+
+            if len(child) or child.items():
+                value = self._etree_to_reply(child, child_path)
+            else:
+                value = child.text
+                value = value.strip() if value else None
+
+            if tag in items:
+                items[tag].append(value)
+            else:
+                items[tag] = [value]
+
+        list_nodes = self._list_nodes
+        for k, v in items.items():
+            # forces a node to type list
+            if len(v) == 1 and paths[k] not in list_nodes:
+                items[k] = v[0]
+
+        if attrs:
+            items.update(('_' + k, v) for k, v in attrs)
+
+        text = t.text
+        if text:
+            text = text.strip()
+            if text:
+                items['value'] = text
+
+        datetime_nodes = self._datetime_nodes
+        if datetime_nodes:
+            for k, v in items.items():
+                if k.lower() in datetime_nodes and hasattr(v, 'partition'):
+                    items[k] = ResponseDataObject._to_datetime(v, datetime_nodes)
+
+        obj = ResponseDataObject.__new__(ResponseDataObject)
+        for k, v in items.items():
+            setattr(obj, k, v)
+
+        return obj
+
     def __getattr__(self, name):
         return getattr(self._obj, name)
 
     def _parse_xml(self, xml):
-        return get_dom_tree(xml)
+        dom = get_dom_tree(xml, get_parser(**self._parser_options))
+
+        if self._fields:
+            self._project(dom)
+            return dom
+
+        # remove xmlns from nodes, I find them meaningless
+        self._strip_xmlns(dom)
+
+        return dom
+
+    def _strip_xmlns(self, elem):
+        for node in elem.iter(lxml.etree.Element):  # pylint: disable=no-member
+            if node.tag[0] == '{':
+                node.tag = self._get_node_tag(node)
+
+    PROJECTION_KEEP = frozenset(('ack', 'errors', 'errormessage', 'error'))
+
+    def _project(self, root):
+        """Drops everything outside of the projected fields from the tree.
+
+        Only the kept nodes and the children cut off next to them are
+        visited, which is far cheaper than converting the whole payload.
+        Ack and error nodes of the response element are always kept.
+        """
+
+        root.tag = self._get_node_tag(root)
+        frames = [root]
+
+        # SOAP responses are wrapped in Envelope and Body
+        if root.tag == 'Envelope':
+            frames = []
+            for child in root.iterchildren(lxml.etree.Element):  # pylint: disable=no-member
+                child.tag = self._get_node_tag(child)
+                for elem in child.iterchildren(lxml.etree.Element):  # pylint: disable=no-member
+                    elem.tag = self._get_node_tag(elem)
+                    frames.append(elem)
+
+        for elem in frames:
+            for child in list(elem.iterchildren(lxml.etree.Element)):  # pylint: disable=no-member
+                tag = self._get_node_tag(child).lower()
+                if tag in self.PROJECTION_KEEP:
+                    self._strip_xmlns(child)
+                else:
+                    self._project_node(elem, child, tag)
+
+    def _project_node(self, parent, elem, path):
+        fields, parents = self._fields
+
+        if path in fields:
+            self._strip_xmlns(elem)
+        elif path in parents:
+            elem.tag = self._get_node_tag(elem)
+            for child in list(elem.iterchildren(lxml.etree.Element)):  # pylint: disable=no-member
+                self._project_node(elem, child, "%s.%s" % (
+                    path, self._get_node_tag(child).lower()))
+        else:
+            parent.remove(elem)
 
     def _get_node_tag(self, node):
-        return node.tag.replace('{' + node.nsmap.get(node.prefix, '') + '}', '')
+        return node.tag.rpartition('}')[2]
 
     def dom(self, lxml=True):
         if not lxml:
             # create and return a cElementTree DOM
             pass
 
+        if self._dom is None:
+            root = self._parse_root()
+            if root is not None:
+                self._load(root, ('dom',))
+
         return self._dom
 
     def dict(self):
+        if self._dict is None:
+            root = self._parse_root(self._dom)
+            if root is not None:
+                self._load(root, ('dict',))
+
         return self._dict
 
     def json(self):
@@ -8,12 +8,21 @@ Licensed under CDDL 1.0
 
 import os
 
-from ebaysdk import log
-from ebaysdk.connection import BaseConnection
+from ebaysdk.connection import BaseConnection, ErrorExtractor
 from ebaysdk.config import Config
 from ebaysdk.utils import getNodeText, dict2xml
 
 
+def error_code(code):
+    "Shopping error codes can be fractional, e.g. 99.99"
+
+    code = float(code)
+    if code.is_integer():
+        return int(code)
+
+    return code
+
+
 class Connection(BaseConnection):
     """Shopping API class
 
@@ -157,7 +166,7 @@ class Connection(BaseConnection):
 
         xml = "<?xml version='1.0' encoding='utf-8'?>"
         xml += "<" + verb + "Request xmlns=\"urn:ebay:apis:eBLBaseComponents\">"
-        xml += dict2xml(data, self.escape_xml)
+        xml += dict2xml(data, self.escape_xml, self.preserve_order)
         xml += "</" + verb + "Request>"
 
         return xml
@@ -171,89 +180,9 @@ class Connection(BaseConnection):
 
         return warning_string
 
-    def _get_resp_body_errors(self):
-        """Parses the response content to pull errors.
-
-        Child classes should override this method based on what the errors in the
-        XML response body look like. They can choose to look at the 'ack',
-        'Errors', 'errorMessage' or whatever other fields the service returns.
-        the implementation below is the original code that was part of error()
-        """
-
-        if self._resp_body_errors and len(self._resp_body_errors) > 0:
-            return self._resp_body_errors
-
-        errors = []
-        warnings = []
-        resp_codes = []
-
-        if self.verb is None:
-            return errors
-
-        dom = self.response.dom()
-        if dom is None:
-            return errors
-
-        for e in dom.findall('Errors'):
-            eSeverity = None
-            eClass = None
-            eShortMsg = None
-            eLongMsg = None
-            eCode = None
-
-            try:
-                eSeverity = e.findall('SeverityCode')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eClass = e.findall('ErrorClassification')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eCode = e.findall('ErrorCode')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eShortMsg = e.findall('ShortMessage')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eLongMsg = e.findall('LongMessage')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eCode = float(e.findall('ErrorCode')[0].text)
-                if eCode.is_integer():
-                    eCode = int(eCode)
-
-                if eCode not in resp_codes:
-                    resp_codes.append(eCode)
-            except IndexError:
-                pass
-
-            msg = "Class: %s, Severity: %s, Code: %s, %s%s" \
-                % (eClass, eSeverity, eCode, eShortMsg, eLongMsg)
-
-            if eSeverity == 'Warning':
-                warnings.append(msg)
-            else:
-                errors.append(msg)
-
-        self._resp_body_warnings = warnings
-        self._resp_body_errors = errors
-        self._resp_codes = resp_codes
-
-        if self.config.get('warnings') and len(warnings) > 0:
-            log.warning("%s: %s\n\n" % (self.verb, "\n".join(warnings)))
-
-        if self.response.reply.Ack == 'Failure':
-            if self.config.get('errors'):
-                log.error("%s: %s\n\n" % (self.verb, "\n".join(errors)))
-            return errors
-
-        return []
+    error_extractor = ErrorExtractor(
+        'Errors', ('SeverityCode', 'ErrorClassification', 'ErrorCode',
+                   'ShortMessage', 'LongMessage'),
+        severity='SeverityCode', code='ErrorCode', code_type=error_code,
+        message="Class: {ErrorClassification}, Severity: {SeverityCode}, "
+                "Code: {code}, {ShortMessage}{LongMessage}")
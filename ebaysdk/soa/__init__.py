@@ -6,8 +6,7 @@ Authored by: Tim Keefer
 Licensed under CDDL 1.0
 '''
 
-from ebaysdk import log
-from ebaysdk.connection import BaseConnection
+from ebaysdk.connection import BaseConnection, ErrorExtractor
 from ebaysdk.config import Config
 from ebaysdk.utils import getNodeText, dict2xml
 
@@ -15,6 +14,10 @@ from ebaysdk.utils import getNodeText, dict2xml
 class Connection(BaseConnection):
     """Connection class for a base SOA service"""
 
+    # request dict elements go in the ser: namespace of the envelope,
+    # see soapify()
+    request_namespace = 'ser'
+
     def __init__(self, app_config=None, site_id='EBAY-US', debug=False, **kwargs):
         """SOA Connection class constructor"""
 
@@ -66,7 +69,9 @@ class Connection(BaseConnection):
             'X-EBAY-SOA-MESSAGE-PROTOCOL': self.config.get('message_protocol'),
         }
 
-    def build_request_data(self, verb, data, verb_attrs):
+    def build_request_envelope(self, verb):
+        "Returns the xml before and after the request dict."
+
         xml = '<?xml version="1.0" encoding="utf-8"?>'
         xml += '<soap:Envelope'
         xml += ' xmlns:soap="http://www.w3.org/2003/05/soap-envelope"'
@@ -74,11 +79,24 @@ class Connection(BaseConnection):
         xml += ' xmlns:ser="%s" >' % self.config.get('soap_env_str')
         xml += '<soap:Body>'
         xml += '<ser:%sRequest>' % verb
-        xml += dict2xml(self.soapify(data), self.escape_xml)
-        xml += '</ser:%sRequest>' % verb
-        xml += '</soap:Body>'
-        xml += '</soap:Envelope>'
-        return xml
+
+        return xml, '</ser:%sRequest></soap:Body></soap:Envelope>' % verb
+
+    def _get_request_envelope(self, verb):
+        "Returns build_request_envelope(), cached like the request headers."
+
+        cache = self._get_request_cache()
+        envelope = cache.get(('envelope', verb))
+
+        if envelope is None:
+            envelope = cache[('envelope', verb)] = self.build_request_envelope(verb)
+
+        return envelope
+
+    def build_request_data(self, verb, data, verb_attrs):
+        head, tail = self._get_request_envelope(verb)
+        return head + dict2xml(data, self.escape_xml, self.preserve_order,
+                               self.request_namespace) + tail
 
     def soapify(self, xml):
         xml_type = type(xml)
@@ -111,83 +129,8 @@ class Connection(BaseConnection):
 
         return warning_string
 
-    def _get_resp_body_errors(self):
-        """Parses the response content to pull errors.
-
-        Child classes should override this method based on what the errors in the
-        XML response body look like. They can choose to look at the 'ack',
-        'Errors', 'errorMessage' or whatever other fields the service returns.
-        the implementation below is the original code that was part of error()
-
-        <errorMessage xmlns="http://www.ebay.com/marketplace/search/v1/services"><error><errorId>5014</errorId><domain>CoreRuntime</domain><severity>Error</severity><category>System</category><message>
-        """
-
-        if self._resp_body_errors and len(self._resp_body_errors) > 0:
-            return self._resp_body_errors
-
-        errors = []
-        warnings = []
-        resp_codes = []
-
-        if self.verb is None:
-            return errors
-
-        dom = self.response.dom()
-        if dom is None:
-            return errors
-
-        for e in dom.findall('error'):
-
-            eSeverity = None
-            eDomain = None
-            eMsg = None
-            eId = None
-
-            try:
-                eSeverity = e.findall('severity')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eDomain = e.findall('domain')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eId = e.findall('errorId')[0].text
-                if int(eId) not in resp_codes:
-                    resp_codes.append(int(eId))
-            except IndexError:
-                pass
-
-            try:
-                eMsg = e.findall('message')[0].text
-            except IndexError:
-                pass
-
-            msg = "Domain: %s, Severity: %s, errorId: %s, %s" \
-                % (eDomain, eSeverity, eId, eMsg)
-
-            if eSeverity == 'Warning':
-                warnings.append(msg)
-            else:
-                errors.append(msg)
-
-        self._resp_body_warnings = warnings
-        self._resp_body_errors = errors
-        self._resp_codes = resp_codes
-
-        if self.config.get('warnings') and len(warnings) > 0:
-            log.warning("%s: %s\n\n" % (self.verb, "\n".join(warnings)))
-
-        try:
-            if self.response.reply.ack == 'Success' and len(errors) > 0 and self.config.get('errors'):
-                log.error("%s: %s\n\n" % (self.verb, "\n".join(errors)))
-            elif len(errors) > 0:
-                if self.config.get('errors'):
-                    log.error("%s: %s\n\n" % (self.verb, "\n".join(errors)))
-                return errors
-        except AttributeError:
-            pass
-
-        return []
+    error_extractor = ErrorExtractor(
+        'error', ('severity', 'domain', 'errorId', 'message'),
+        severity='severity', code='errorId',
+        message="Domain: {domain}, Severity: {severity}, errorId: {errorId}, {message}",
+        ack='ack', ack_success=True, missing_ack_fails=False)
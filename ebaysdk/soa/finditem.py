@@ -9,7 +9,7 @@ Licensed under CDDL 1.0
 import os
 
 from ebaysdk.soa import Connection as BaseConnection
-from ebaysdk.utils import dict2xml, getNodeText
+from ebaysdk.utils import getNodeText
 
 
 class Connection(BaseConnection):
@@ -37,6 +37,8 @@ class Connection(BaseConnection):
     True
     """
 
+    request_namespace = None
+
     def __init__(self, site_id='EBAY-US', debug=False, consumer_id=None,
                  domain='apifindingcore.vip.ebay.com', **kwargs):
 
@@ -116,12 +118,10 @@ class Connection(BaseConnection):
     def find_items_by_ids(self, *args, **kwargs):
         return self.findItemsByIds(*args, **kwargs)
 
-    def build_request_data(self, verb, data, verb_attrs):
+    def build_request_envelope(self, verb):
         xml = "<?xml version='1.0' encoding='utf-8'?>"
         xml += "<" + verb + "Request"
         xml += ' xmlns="http://www.ebay.com/marketplace/search/v1/services"'
         xml += '>'
-        xml += dict2xml(data, self.escape_xml)
-        xml += "</" + verb + "Request>"
 
-        return xml
+        return xml, "</" + verb + "Request>"
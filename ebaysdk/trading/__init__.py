@@ -8,10 +8,9 @@ Licensed under CDDL 1.0
 
 import os
 
-from ebaysdk import log
-from ebaysdk.connection import BaseConnection
+from ebaysdk.connection import BaseConnection, ErrorExtractor
 from ebaysdk.config import Config
-from ebaysdk.utils import getNodeText, dict2xml, smart_encode
+from ebaysdk.utils import getNodeText, dict2xml, Slot
 from ebaysdk.exception import RequestPaginationError, PaginationLimit
 
 
@@ -75,6 +74,25 @@ class Connection(BaseConnection):
         parallel      -- ebaysdk parallel object
         response_encoding -- API encoding (default: XML)
         request_encoding  -- API encoding (default: XML)
+        huge_tree     -- lift the XML parser limits, needed for large
+                         GetCategories responses (default: False)
+        escape_xml    -- escape request values, 'safe' escapes all text
+                         and attribute values (default: False)
+        preserve_order -- serialize request dicts in insertion order
+                          instead of sorting keys (default: False)
+        stream_request -- send request bodies chunked from a generator,
+                          e.g. bulk listings or picture uploads (default: False)
+        pool_connections -- kept-alive connection pools, one per host
+                            (default: 10)
+        pool_maxsize  -- kept-alive connections per host (default: 10)
+        verify        -- verify TLS certificates, or a CA bundle path
+                         (default: True)
+        shared_session -- send calls through the process-wide session for
+                          the endpoint, False for a session of its own
+                          (default: True)
+        precise_datetimes -- keep the milliseconds and timezone of
+                             datetime_nodes, instead of naive datetimes
+                             to the second (default: False)
         """
         super(Connection, self).__init__(method='POST', **kwargs)
 
@@ -683,7 +701,7 @@ class Connection(BaseConnection):
             "X-EBAY-API-APP-NAME": self.config.get('appid', ''),
             "X-EBAY-API-CERT-NAME": self.config.get('certid', ''),
             "X-EBAY-API-SITEID": str(self.config.get('siteid', '')),
-            "X-EBAY-API-CALL-NAME": self.verb,
+            "X-EBAY-API-CALL-NAME": verb,
             "Content-Type": "text/xml"
         }
         if self.config.get('iaf_token', None):
@@ -694,7 +712,7 @@ class Connection(BaseConnection):
     def build_request_data(self, verb, data, verb_attrs):
         xml = "<?xml version='1.0' encoding='utf-8'?>"
         xml += "<{verb}Request xmlns=\"urn:ebay:apis:eBLBaseComponents\">".format(
-            verb=self.verb)
+            verb=verb)
         if not self.config.get('iaf_token', None):
             xml += "<RequesterCredentials>"
             if self.config.get('token', None):
@@ -707,8 +725,8 @@ class Connection(BaseConnection):
                     xml += "<Password>{password}</Password>".format(
                         password=self.config.get('password', None))
             xml += "</RequesterCredentials>"
-        xml += dict2xml(data, self.escape_xml)
-        xml += "</{verb}Request>".format(verb=self.verb)
+        xml += dict2xml(data, self.escape_xml, self.preserve_order)
+        xml += "</{verb}Request>".format(verb=verb)
         return xml
 
     def warnings(self):
@@ -720,95 +738,12 @@ class Connection(BaseConnection):
 
         return warning_string
 
-    def _get_resp_body_errors(self):
-        """Parses the response content to pull errors.
-
-        Child classes should override this method based on what the errors in the
-        XML response body look like. They can choose to look at the 'ack',
-        'Errors', 'errorMessage' or whatever other fields the service returns.
-        the implementation below is the original code that was part of error()
-        """
-
-        if self._resp_body_errors and len(self._resp_body_errors) > 0:
-            return self._resp_body_errors
-
-        errors = []
-        warnings = []
-        resp_codes = []
-
-        if self.verb is None:
-            return errors
-
-        dom = self.response.dom()
-        if dom is None:
-            return errors
-
-        for e in dom.findall('Errors'):
-            eSeverity = None
-            eClass = None
-            eShortMsg = None
-            eLongMsg = None
-            eCode = None
-
-            try:
-                eSeverity = e.findall('SeverityCode')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eClass = e.findall('ErrorClassification')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eCode = e.findall('ErrorCode')[0].text
-            except IndexError:
-                pass
-
-            try:
-                eShortMsg = smart_encode(e.findall('ShortMessage')[0].text)
-            except IndexError:
-                pass
-
-            try:
-                eLongMsg = smart_encode(e.findall('LongMessage')[0].text)
-            except IndexError:
-                pass
-
-            try:
-                eCode = e.findall('ErrorCode')[0].text
-                if int(eCode) not in resp_codes:
-                    resp_codes.append(int(eCode))
-            except IndexError:
-                pass
-
-            msg = str("Class: {eClass}, Severity: {severity}, Code: {code}, {shortMsg} {longMsg}") \
-                .format(eClass=eClass, severity=eSeverity, code=eCode, shortMsg=eShortMsg,
-                        longMsg=eLongMsg)
-
-            # from IPython import embed; embed()
-
-            if eSeverity == 'Warning':
-                warnings.append(msg)
-            else:
-                errors.append(msg)
-
-        self._resp_body_warnings = warnings
-        self._resp_body_errors = errors
-        self._resp_codes = resp_codes
-
-        if self.config.get('warnings') and len(warnings) > 0:
-            log.warning("{verb}: {message}\n\n".format(
-                verb=self.verb, message="\n".join(warnings)))
-
-        if self.response.reply.Ack == 'Failure':
-            if self.config.get('errors'):
-                log.error("{verb}: {message}\n\n".format(
-                    verb=self.verb, message="\n".join(errors)))
-
-            return errors
-
-        return []
+    error_extractor = ErrorExtractor(
+        'Errors', ('SeverityCode', 'ErrorClassification', 'ErrorCode',
+                   'ShortMessage', 'LongMessage'),
+        severity='SeverityCode', code='ErrorCode', encode=('ShortMessage', 'LongMessage'),
+        message="Class: {ErrorClassification}, Severity: {SeverityCode}, "
+                "Code: {ErrorCode}, {ShortMessage} {LongMessage}")
 
     def pages(self):
 
@@ -821,12 +756,25 @@ class Connection(BaseConnection):
             tot_pages = int(resp.reply.PaginationResult.TotalNumberOfPages)
             yield resp
 
-        for page in range(tot_pages)[1:]:
-            self._request_dict['Pagination'] = {}
+        if tot_pages > 1:
+            request_dict = self._request_dict
 
+            pagination = {}
             if epp:
-                self._request_dict['Pagination']['EntriesPerPage'] = epp
+                pagination['EntriesPerPage'] = epp
+            pagination['PageNumber'] = Slot('page')
+
+            shape = dict(request_dict)
+            shape['Pagination'] = pagination
+            call = self.prepare_call(self.verb, shape)
+
+            for page in range(tot_pages)[1:]:
+                request_dict['Pagination'] = {}
+
+                if epp:
+                    request_dict['Pagination']['EntriesPerPage'] = epp
 
-            self._request_dict['Pagination']['PageNumber'] = int(page) + 1
+                request_dict['Pagination']['PageNumber'] = int(page) + 1
 
-            yield self.execute(self.verb, self._request_dict)
+                yield self.execute_prepared(call, {'page': int(page) + 1},
+                                            request_dict)
@@ -6,14 +6,43 @@ Copyright 2012-2019 eBay Inc.
 Authored by: Tim Keefer
 Licensed under CDDL 1.0
 '''
+import re
 import sys
+import datetime
+import threading
+from collections import namedtuple
 from lxml import etree as ET
-from xml.sax.saxutils import escape
 
 if sys.version_info[0] >= 3:
     unicode = str
     long = int
 
+try:
+    UTC = datetime.timezone.utc
+
+    def _fixed_offset(minutes):
+        return datetime.timezone(datetime.timedelta(minutes=minutes))
+
+except AttributeError:
+    class _FixedOffset(datetime.tzinfo):
+
+        def __init__(self, minutes):
+            self._offset = datetime.timedelta(minutes=minutes)
+
+        def utcoffset(self, dt):
+            return self._offset
+
+        def dst(self, dt):
+            return datetime.timedelta(0)
+
+        def tzname(self, dt):
+            return None
+
+    def _fixed_offset(minutes):
+        return _FixedOffset(minutes)
+
+    UTC = _fixed_offset(0)
+
 
 def parse_yaml(yaml_file):
     """
@@ -73,12 +102,158 @@ def python_2_unicode_compatible(klass):
     return klass
 
 
-def get_dom_tree(xml):
-    tree = ET.fromstring(xml)  # pylint: disable=no-member
+def parse_datetime(value):
+    """Decodes eBay's ISO 8601 timestamps (YYYY-MM-DDTHH:MM:SS.sssZ)
+
+    Fractional seconds and the timezone are kept, values without a
+    timezone designator come back as naive datetimes. Returns None if
+    value is not in that format.
+
+    >>> parse_datetime('2014-02-07T23:31:13.941Z') == datetime.datetime(2014, 2, 7, 23, 31, 13, 941000, UTC)
+    True
+    >>> parse_datetime('2014-02-07T23:31:13-07:00').utcoffset() == datetime.timedelta(hours=-7)
+    True
+    >>> parse_datetime('2014-02-07T23:31:13')
+    datetime.datetime(2014, 2, 7, 23, 31, 13)
+    >>> parse_datetime('2014-02-07') is None
+    True
+    >>> parse_datetime('2014-02-07T23:31:13.9Zulu') is None
+    True
+    """
+
+    try:
+        if value[4] != '-' or value[7] != '-' or value[10] != 'T' \
+                or value[13] != ':' or value[16] != ':':
+            return None
+
+        year, month, day = int(value[0:4]), int(value[5:7]), int(value[8:10])
+        hour, minute, second = int(value[11:13]), int(value[14:16]), int(value[17:19])
+    except (IndexError, TypeError, ValueError):
+        return None
+
+    pos = 19
+    microsecond = 0
+
+    if value[pos:pos + 1] == '.':
+        end = pos + 1
+        while value[end:end + 1].isdigit():
+            end += 1
+
+        fraction = value[pos + 1:end]
+        if not fraction:
+            return None
+
+        microsecond = int((fraction + '00000')[:6])
+        pos = end
+
+    tz = value[pos:]
+    if not tz:
+        tzinfo = None
+    elif tz == 'Z':
+        tzinfo = UTC
+    elif len(tz) == 6 and tz[0] in '+-' and tz[3] == ':' \
+            and tz[1:3].isdigit() and tz[4:6].isdigit():
+        minutes = int(tz[1:3]) * 60 + int(tz[4:6])
+        tzinfo = _fixed_offset(-minutes if tz[0] == '-' else minutes)
+    else:
+        return None
+
+    try:
+        return datetime.datetime(year, month, day, hour, minute, second,
+                                 microsecond, tzinfo)
+    except ValueError:
+        return None
+
+
+PARSER_OPTIONS = {
+    'remove_blank_text': True,
+    'resolve_entities': False,
+    'huge_tree': False,
+    'remove_comments': False,
+}
+
+_parsers = threading.local()
+
+
+def get_parser(**options):
+    """Returns this thread's XMLParser for the given options.
+
+    Options default to PARSER_OPTIONS. Parsers aren't thread safe, so
+    each thread creates one per set of options and keeps reusing it.
+
+    >>> get_parser() is get_parser(remove_blank_text=True)
+    True
+    >>> get_parser() is get_parser(huge_tree=True)
+    False
+    """
+
+    key = tuple(bool(options.get(k, v)) for k, v in sorted(PARSER_OPTIONS.items()))
+
+    parsers = getattr(_parsers, 'cache', None)
+    if parsers is None:
+        parsers = _parsers.cache = dict()
+
+    parser = parsers.get(key)
+    if parser is None:
+        parser = ET.XMLParser(  # pylint: disable=no-member
+            **dict(zip(sorted(PARSER_OPTIONS), key)))
+        parsers[key] = parser
+
+    return parser
+
+
+def get_dom_tree(xml, parser=None):
+    if parser is None:
+        parser = get_parser()
+
+    tree = ET.fromstring(xml, parser)  # pylint: disable=no-member
     return tree.getroottree().getroot()
 
 
-def attribute_check(root):
+def escape_text(value):
+    """Escapes &, < and > in element text, CDATA sections are left alone.
+
+    >>> escape_text('Tom & Jerry <DVD>')
+    'Tom &amp; Jerry &lt;DVD&gt;'
+    >>> escape_text('<![CDATA[<b>bold</b>]]>')
+    '<![CDATA[<b>bold</b>]]>'
+    """
+
+    # most values need no escaping, the membership tests are much
+    # cheaper than replace() or a regex
+    if '<' in value:
+        if value.startswith('<![CDATA['):
+            return value
+        value = value.replace('&', '&amp;').replace('<', '&lt;')
+    elif '&' in value:
+        value = value.replace('&', '&amp;')
+
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+
+    return value
+
+
+def escape_attribute(value):
+    """Escapes &, <, > and double quotes in attribute values.
+
+    >>> escape_attribute('"Tom" & <Jerry>')
+    '&quot;Tom&quot; &amp; &lt;Jerry&gt;'
+    """
+
+    if '&' in value:
+        value = value.replace('&', '&amp;')
+    if '<' in value:
+        value = value.replace('<', '&lt;')
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+    if '"' in value:
+        value = value.replace('"', '&quot;')
+
+    return value
+
+
+def attribute_check(root, escape=False):
     attrs = []
     value = None
 
@@ -86,8 +261,11 @@ def attribute_check(root):
         if '#text' in root:
             value = root['#text']
         if '@attrs' in root:
-            for ak, av in sorted(root.pop('@attrs').items()):
-                attrs.append(str('{0}="{1}"').format(ak, smart_encode(av)))
+            for ak, av in sorted(root['@attrs'].items()):
+                av = smart_encode(av)
+                if escape:
+                    av = escape_attribute(str('{0}').format(av))
+                attrs.append(str('{0}="{1}"').format(ak, av))
 
     return attrs, value
 
@@ -131,8 +309,19 @@ def to_xml(root):
     return dict2xml(root)
 
 
-def dict2xml(root, escape_xml=False):
+def dict2xml(root, escape_xml=False, preserve_order=False, namespace=None):
     '''
+    escape_xml=True escapes the text of scalar values (see escape_text()).
+    escape_xml='safe' escapes all text, including '#text' values and
+    list items, and attribute values as well.
+
+    Child elements are written in sorted key order unless preserve_order
+    is set, then they follow the dict's insertion order (use an
+    OrderedDict before Python 3.7). Attributes are always sorted.
+
+    namespace prefixes every element name that has no prefix yet, e.g.
+    'ser' for SOAP requests. Dicts given as '#text' are written as is.
+
     Doctests:
     >>> dict1 = {'Items': {'ItemId': ['1234', '2222']}}
     >>> dict2xml(dict1)
@@ -173,6 +362,12 @@ def dict2xml(root, escape_xml=False):
     ... }
     >>> dict2xml(dict4)
     '<itemFilter><name>Condition</name><value>Used</value></itemFilter><itemFilter><name>LocatedIn</name><value>GB</value></itemFilter><paginationInput><pageNumber>1</pageNumber><pageSize>25</pageSize></paginationInput><searchFilter><categoryId site="US">0</categoryId></searchFilter><sortOrder>StartTimeNewest</sortOrder>'
+    >>> dict2xml(dict2, preserve_order=True)
+    '<searchFilter><categoryId site="US">222</categoryId></searchFilter><paginationInput><pageNumber>1</pageNumber><pageSize>25</pageSize></paginationInput><sortOrder>StartTimeNewest</sortOrder>'
+    >>> dict2xml({'a': {'b': 1, 'x:c': [2, 3]}}, namespace='ser')
+    '<ser:a><ser:b>1</ser:b><x:c>2</x:c><x:c>3</x:c></ser:a>'
+    >>> dict2xml({'a': {'#text': 'Tom & Jerry', '@attrs': {'t': '"x"'}}, 'b': ['<1>']}, escape_xml='safe')
+    '<a t="&quot;x&quot;">Tom &amp; Jerry</a><b>&lt;1&gt;</b>'
     >>> dict2xml({})
     ''
     >>> dict2xml('<a>b</a>')
@@ -225,63 +420,269 @@ def dict2xml(root, escape_xml=False):
     '<itemFilter><name>Condition - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</name><value>Used - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</value></itemFilter><itemFilter><name>LocatedIn - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</name><value>GB - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</value></itemFilter><paginationInput><pageNumber>1 - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</pageNumber><pageSize>25 - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</pageSize></paginationInput><searchFilter><categoryId site="US - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87">SomeID - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</categoryId></searchFilter><sortOrder>StartTimeNewest - \\xc5\\x82\\xc5\\x9b\\xc5\\xbc\\xc5\\xba\\xc4\\x87</sortOrder>'
     '''
 
-    xml = str('')
-    if root is None:
-        return xml
+    parts = []
+    _dict2xml(root, _escape_level(escape_xml), preserve_order, _tags(namespace), parts)
+    return str('').join(parts)
 
-    if isinstance(root, dict):
-        for key in sorted(root.keys()):
 
-            if isinstance(root[key], dict):
-                attrs, value = attribute_check(root[key])
+SAFE_XML = 'safe'
+
+
+def _escape_level(escape_xml):
+    "0 no escaping, 1 scalar values (escape_xml=True), 2 everything ('safe')"
+
+    if escape_xml == SAFE_XML:
+        return 2
+    return 1 if escape_xml else 0
+
+
+class _NamespacedTags(dict):
+    "Maps the keys of a request dict to their prefixed element names"
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def __missing__(self, key):
+        if key == '#text' or key == '@attrs' or ':' in key:
+            tag = key
+        else:
+            tag = str('{0}:{1}').format(self.namespace, key)
+
+        self[key] = tag
+        return tag
+
+
+def _tags(namespace):
+    return _NamespacedTags(namespace) if namespace else None
 
-                if value is None:
-                    value = dict2xml(root[key], escape_xml)
-                elif isinstance(value, dict):
-                    value = dict2xml(value, escape_xml)
 
-                attrs_sp = str('')
-                if len(attrs) > 0:
-                    attrs_sp = str(' ')
+def _keys(root, preserve_order, tags):
+    "Returns the keys of root in the order they are serialized"
 
-                xml = str('{xml}<{tag}{attrs_sp}{attrs}>{value}</{tag}>') \
-                    .format(**{'tag': key, 'xml': str(xml), 'attrs': str(' ').join(attrs),
-                               'value': smart_encode(value), 'attrs_sp': attrs_sp})
+    if preserve_order:
+        return root
+    elif tags is None:
+        return sorted(root)
 
-            elif isinstance(root[key], list):
+    return sorted(root, key=tags.__getitem__)
 
-                for item in root[key]:
-                    attrs, value = attribute_check(item)
 
-                    if value is None:
-                        value = dict2xml(item, escape_xml)
-                    elif isinstance(value, dict):
-                        value = dict2xml(value, escape_xml)
+def _dict2xml(root, escape_xml, preserve_order, tags, parts, element=False):
+    "Appends the xml for root to parts, see dict2xml()"
 
-                    attrs_sp = ''
-                    if len(attrs) > 0:
-                        attrs_sp = ' '
+    if root is None:
+        return
+
+    if isinstance(root, dict):
+        for key in _keys(root, preserve_order, tags):
+            # attributes were already rendered into the element's start tag
+            if element and key == '@attrs':
+                continue
 
-                    xml = str('{xml}<{tag}{attrs_sp}{attrs}>{value}</{tag}>') \
-                        .format(**{'xml': str(xml), 'tag': key, 'attrs': ' '.join(attrs), 'value': smart_encode(value),
-                                   'attrs_sp': attrs_sp})
+            node = root[key]
+            tag = key if tags is None else tags[key]
+
+            if isinstance(node, dict):
+                _dict2xml_element(tag, node, escape_xml, preserve_order, tags, parts)
+
+            elif isinstance(node, list):
+                for item in node:
+                    _dict2xml_element(tag, item, escape_xml, preserve_order, tags, parts)
 
             else:
-                value = root[key]
-                if escape_xml and hasattr(value, 'startswith') and not value.startswith('<![CDATA['):
-                    value = escape(value)
-                xml = str('{xml}<{tag}>{value}</{tag}>') \
-                    .format(**{'xml': str(xml), 'tag': key, 'value': smart_encode(value)})
-
-    elif isinstance(root, str) or isinstance(root, int) \
-            or isinstance(root, float) or isinstance(root, long) \
-            or isinstance(root, unicode):
-        xml = str('{0}{1}').format(str(xml), smart_encode(root))
+                if escape_xml and hasattr(node, 'startswith'):
+                    node = escape_text(node)
+                parts.append(str('<{0}>{1}</{0}>').format(tag, smart_encode(node)))
+
+    elif isinstance(root, (str, int, float, long, unicode)):
+        parts.append(str('{0}').format(smart_encode(root)))
     else:
         raise Exception('Unable to serialize node of type %s (%s)' %
                         (type(root), root))
 
-    return xml
+
+def _dict2xml_element(tag, node, escape_xml, preserve_order, tags, parts):
+    attrs, value = attribute_check(node, escape_xml > 1)
+
+    if len(attrs) > 0:
+        parts.append(str('<{0} {1}>').format(tag, str(' ').join(attrs)))
+    else:
+        parts.append(str('<{0}>').format(tag))
+
+    if value is None:
+        if escape_xml > 1 and hasattr(node, 'startswith'):
+            node = escape_text(node)
+        _dict2xml(node, escape_xml, preserve_order, tags, parts, element=True)
+    elif isinstance(value, dict):
+        _dict2xml(value, escape_xml, preserve_order, None, parts)
+    elif escape_xml > 1:
+        parts.append(escape_text(str('{0}').format(smart_encode(value))))
+    else:
+        parts.append(str('{0}').format(smart_encode(value)))
+
+    parts.append(str('</{0}>').format(tag))
+
+
+def iter_dict2xml(root, escape_xml=False, preserve_order=False, namespace=None,
+                  chunk_size=65536):
+    """Generator version of dict2xml().
+
+    Yields the xml utf-8 encoded, in chunks of about chunk_size bytes
+    that end on element boundaries, so the whole document is never held
+    in memory at once.
+
+    >>> b''.join(iter_dict2xml({'Items': {'ItemId': ['1234', '2222']}}, chunk_size=10))
+    b'<Items><ItemId>1234</ItemId><ItemId>2222</ItemId></Items>'
+    """
+
+    parts = []
+    size = 0
+    counted = 0
+
+    for _ in _iter_dict2xml(root, _escape_level(escape_xml), preserve_order,
+                            _tags(namespace), parts):
+        size += sum(len(part) for part in parts[counted:])
+        counted = len(parts)
+
+        if size >= chunk_size:
+            yield smart_encode_request_data(str('').join(parts))
+            del parts[:]
+            size = counted = 0
+
+    if parts:
+        yield smart_encode_request_data(str('').join(parts))
+
+
+def _iter_dict2xml(root, escape_xml, preserve_order, tags, parts, element=False):
+    "Same walk as _dict2xml(), yields after each element it appended"
+
+    if not isinstance(root, dict):
+        _dict2xml(root, escape_xml, preserve_order, tags, parts)
+        return
+
+    for key in _keys(root, preserve_order, tags):
+        if element and key == '@attrs':
+            continue
+
+        node = root[key]
+
+        if isinstance(node, (dict, list)):
+            tag = key if tags is None else tags[key]
+            for item in (node if isinstance(node, list) else [node]):
+                for _ in _iter_dict2xml_element(tag, item, escape_xml,
+                                                preserve_order, tags, parts):
+                    yield
+        else:
+            _dict2xml({key: node}, escape_xml, preserve_order, tags, parts)
+
+        yield
+
+
+def _iter_dict2xml_element(tag, node, escape_xml, preserve_order, tags, parts):
+    attrs, value = attribute_check(node, escape_xml > 1)
+
+    if value is None and isinstance(node, dict):
+        parts.append(str('<{0}>').format(str(' ').join([tag] + attrs)))
+        for _ in _iter_dict2xml(node, escape_xml, preserve_order, tags,
+                                parts, element=True):
+            yield
+        parts.append(str('</{0}>').format(tag))
+    else:
+        _dict2xml_element(tag, node, escape_xml, preserve_order, tags, parts)
+
+    yield
+
+
+class Slot(object):
+    """Stands for a leaf value of a request dict passed to RequestTemplate."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Slot(%r)' % self.name
+
+
+RequestBody = namedtuple('RequestBody', 'verb body')
+
+_SLOT_MARKER = re.compile('\x00(\\d+)\x00')
+
+
+def _mark_slots(shape, names):
+    if isinstance(shape, Slot):
+        names.append(shape.name)
+        return '\x00%d\x00' % (len(names) - 1)
+    elif isinstance(shape, dict):
+        return type(shape)((k, _mark_slots(v, names)) for k, v in shape.items())
+    elif isinstance(shape, list):
+        return [_mark_slots(v, names) for v in shape]
+
+    return shape
+
+
+def escape_slot(value):
+    """
+    >>> escape_slot('Tom & Jerry <"DVD">')
+    'Tom &amp; Jerry &lt;&quot;DVD&quot;&gt;'
+    >>> escape_slot('<![CDATA[<b>bold</b>]]>')
+    '<![CDATA[<b>bold</b>]]>'
+    >>> escape_slot(10)
+    '10'
+    """
+
+    if hasattr(value, 'startswith'):
+        if value.startswith('<![CDATA['):
+            return smart_encode(value)
+        return smart_encode(escape_attribute(value))
+
+    return str('{0}').format(smart_encode(value))
+
+
+class RequestTemplate(object):
+    """Request body compiled once from a dict shape with Slot leaves.
+
+    serialize turns the shape into the full request body, e.g. a
+    connection's build_request_data(). render() then only fills in the
+    slots with escaped values, see BaseConnection.compile_request().
+
+    >>> t = RequestTemplate({'ItemID': Slot('item'), 'Qty': [Slot('qty'), 1]}, dict2xml)
+    >>> t.slots
+    ['item', 'qty']
+    >>> t.render(item='1 & 2', qty=5).body
+    b'<ItemID>1 &amp; 2</ItemID><Qty>5</Qty><Qty>1</Qty>'
+    >>> t.render(item=1)
+    Traceback (most recent call last):
+        ...
+    ValueError: missing value for slot qty
+    """
+
+    def __init__(self, shape, serialize, verb=None):
+        names = []
+        parts = _SLOT_MARKER.split(serialize(_mark_slots(shape, names)))
+
+        self.verb = verb
+        self.slots = names
+        self._head = parts[0]
+        self._tail = [(names[int(index)], literal)
+                      for index, literal in zip(parts[1::2], parts[2::2])]
+        self._names = frozenset(names)
+
+    def render(self, **values):
+        "Returns a RequestBody with the slots filled in from values."
+
+        if not self._names.issuperset(values):
+            raise ValueError('unknown slots %s' %
+                             ', '.join(sorted(set(values) - self._names)))
+
+        body = [self._head]
+        try:
+            for name, literal in self._tail:
+                body.append(escape_slot(values[name]))
+                body.append(literal)
+        except KeyError as e:
+            raise ValueError('missing value for slot %s' % e.args[0])
+
+        return RequestBody(self.verb, smart_encode_request_data(str('').join(body)))
 
 
 def getValue(response_dict, *args, **kwargs):
@@ -348,6 +749,36 @@ def perftest_dict2xml():
     xml = dict2xml(sample_dict)
 
 
+def large_item_dict(num_variations=2000, num_compatibility=5000):
+    variations = [{
+        'SKU': 'SKU-%d' % i,
+        'StartPrice': {'#text': '%d.99' % i, '@attrs': {'currencyID': 'USD'}},
+        'Quantity': 10,
+        'VariationSpecifics': {'NameValueList': [
+            {'Name': 'Color', 'Value': 'Color %d' % i},
+            {'Name': 'Size', 'Value': 'Size %d' % i},
+        ]},
+    } for i in range(num_variations)]
+
+    compatibility = [{'NameValueList': [
+        {'Name': 'Make', 'Value': 'Make %d' % i},
+        {'Name': 'Model', 'Value': 'Model %d' % i},
+        {'Name': 'Year', 'Value': 2000 + i % 20},
+    ]} for i in range(num_compatibility)]
+
+    return {'Item': {
+        'Title': 'Harry Potter and the Philosopher\'s Stone',
+        'Description': '<![CDATA[<p>This is the first book in the series.</p>]]>',
+        'PrimaryCategory': {'CategoryID': '377'},
+        'Variations': {'Variation': variations},
+        'ItemCompatibilityList': {'Compatibility': compatibility},
+    }}
+
+
+def perftest_dict2xml_large(item, preserve_order=False, escape_xml=True):
+    xml = dict2xml(item, escape_xml=escape_xml, preserve_order=preserve_order)
+
+
 if __name__ == '__main__':
 
     import timeit
@@ -355,6 +786,15 @@ if __name__ == '__main__':
           timeit.timeit("perftest_dict2xml()", number=50000,
                         setup="from __main__ import perftest_dict2xml"))
 
+    for preserve_order, escape_xml in ((False, True), (True, True),
+                                       (False, False), (False, SAFE_XML)):
+        print("perftest_dict2xml_large(preserve_order=%s, escape_xml=%s) %s" % (
+            preserve_order, escape_xml,
+            timeit.timeit("perftest_dict2xml_large(item, %s, %r)" %
+                          (preserve_order, escape_xml), number=10,
+                          setup="from __main__ import perftest_dict2xml_large, "
+                                "large_item_dict; item = large_item_dict()")))
+
     import doctest
     failure_count, test_count = doctest.testmod()
     sys.exit(failure_count)
@@ -7,13 +7,21 @@ Licensed under CDDL 1.0
 '''
 import sys
 import os
+import time
+import datetime
 import ujson
 import json
 
 sys.path.insert(0, '%s/../' % os.path.dirname(__file__))
 
-from ebaysdk.utils import dict2xml
+from lxml import etree
+
+from ebaysdk.utils import dict2xml, parse_datetime, get_dom_tree, Slot
+from ebaysdk.utils import large_item_dict
 from ebaysdk.response import Response, ResponseDataObject
+from ebaysdk.trading import Connection as Trading
+from ebaysdk.soa import Connection as SOA
+from ebaysdk.soa.finditem import Connection as FindItem
 
 
 def tojson():
@@ -62,6 +70,416 @@ def response():
                  'finditemsbyproductresponse.searchresult.item', 'finditemsbyproductresponse.paginationoutput.pagenumber'])
 
 
+def getorders_xml(num_orders):
+    order = (
+        '<Order><OrderID>{0}-1</OrderID><OrderStatus>Completed</OrderStatus>'
+        '<CheckoutStatus><PaymentMethod>PayPal</PaymentMethod>'
+        '<LastModifiedTime>2014-02-07T23:31:13.941Z</LastModifiedTime></CheckoutStatus>'
+        '<ShippingDetails><ShippingServiceOptions><ShippingService>USPSPriority</ShippingService>'
+        '<ShippingServiceCost currencyID="USD">5.00</ShippingServiceCost></ShippingServiceOptions>'
+        '</ShippingDetails><Total currencyID="USD">25.00</Total>'
+        '<TransactionArray><Transaction><Item><ItemID>{0}</ItemID><Title>Item {0}</Title></Item>'
+        '<QuantityPurchased>1</QuantityPurchased>'
+        '<CreatedDate>2014-02-07T23:31:13.941Z</CreatedDate></Transaction></TransactionArray>'
+        '<PaidTime>2014-02-07T23:31:13.941Z</PaidTime></Order>'
+    )
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<GetOrdersResponse xmlns="urn:ebay:apis:eBLBaseComponents">'
+        '<Timestamp>2014-02-07T23:31:13.941Z</Timestamp><Ack>Success</Ack>'
+        '<OrderArray>%s</OrderArray></GetOrdersResponse>'
+    ) % ''.join(order.format(1000000 + i) for i in range(num_orders))
+
+
+def getorders_scaling(sizes=(500, 1000, 2500, 5000)):
+    api = Trading(config_file=None)
+    list_nodes = api._get_list_nodes('GetOrders')
+
+    for num_orders in sizes:
+        o = ResponseDataObject(
+            {'content': getorders_xml(num_orders).encode('utf-8')}, [])
+
+        start = time.time()
+        r = Response(o, verb='GetOrders', list_nodes=list_nodes,
+                     datetime_nodes=api._get_datetime_nodes())
+        elapsed = time.time() - start
+
+        assert len(r.reply.OrderArray.Order) == num_orders
+        print("GetOrders %5d orders: %.3fs (%.1fus/order)" %
+              (num_orders, elapsed, elapsed / num_orders * 1000000))
+
+
+def getorders_projection(num_orders=5000):
+    api = Trading(config_file=None)
+    list_nodes = api._get_list_nodes('GetOrders')
+    o = ResponseDataObject(
+        {'content': getorders_xml(num_orders).encode('utf-8')}, [])
+
+    for fields in (None, ['OrderArray.Order.OrderID', 'OrderArray.Order.Total']):
+        start = time.time()
+        r = Response(o, verb='GetOrders', list_nodes=list_nodes,
+                     datetime_nodes=api._get_datetime_nodes(), fields=fields)
+        elapsed = time.time() - start
+
+        assert len(r.reply.OrderArray.Order) == num_orders
+        print("GetOrders %d orders, fields=%s: %.3fs" %
+              (num_orders, fields, elapsed))
+
+
+def parser_options(num_orders=5000):
+    compact = getorders_xml(num_orders).encode('utf-8')
+    pretty = etree.tostring(etree.fromstring(compact), pretty_print=True,
+                            xml_declaration=True, encoding='UTF-8')
+
+    import timeit
+
+    for name, xml in (('compact', compact), ('pretty printed', pretty)):
+        default = min(timeit.repeat(lambda: etree.fromstring(xml),
+                                    number=1, repeat=9))
+        tuned = min(timeit.repeat(lambda: get_dom_tree(xml),
+                                  number=1, repeat=9))
+        print("parse %s GetOrders: default %.4fs, tuned %.4fs" %
+              (name, default, tuned))
+
+
+def compiled_request(num_requests=10000):
+    api = Trading(config_file=None, token='AgAAAA')
+    template = api.compile_request('ReviseInventoryStatus', {
+        'InventoryStatus': {'ItemID': Slot('item'), 'Quantity': Slot('quantity')}
+    })
+
+    start = time.time()
+    for i in range(num_requests):
+        api.build_request_data('ReviseInventoryStatus', {
+            'InventoryStatus': {'ItemID': str(i), 'Quantity': i}}, None)
+    built = time.time() - start
+
+    start = time.time()
+    for i in range(num_requests):
+        template.render(item=str(i), quantity=i)
+    rendered = time.time() - start
+
+    print("ReviseInventoryStatus %d bodies: build_request_data %.3fs, "
+          "compiled %.3fs" % (num_requests, built, rendered))
+
+
+def stream_request_memory():
+    import tracemalloc
+
+    item = large_item_dict()
+
+    for stream_request in (False, True):
+        api = Trading(config_file=None, token='AgAAAA',
+                      stream_request=stream_request)
+
+        tracemalloc.start()
+        if stream_request:
+            for chunk in api.iter_request_data('AddFixedPriceItem', item, None):
+                pass
+        else:
+            api.build_request_data(
+                'AddFixedPriceItem', item, None).encode('utf-8')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print("AddFixedPriceItem body, stream_request=%s: peak %.1fMB" %
+              (stream_request, peak / 1024.0 / 1024.0))
+
+
+def request_headers(num_calls=100000):
+    api = Trading(config_file=None, appid='a', devid='d', certid='c')
+
+    start = time.time()
+    for i in range(num_calls):
+        api.build_request_url('GetItem')
+        api.build_request_headers('GetItem')
+    built = time.time() - start
+
+    start = time.time()
+    for i in range(num_calls):
+        api._get_request_url('GetItem')
+        dict(api._get_request_headers('GetItem'))
+    cached = time.time() - start
+
+    print("GetItem headers and url x%d: built %.3fs, cached %.3fs" %
+          (num_calls, built, cached))
+
+
+def soa_request(num_requests=20000):
+    search = {'searchRequest': {
+        'keywords': 'harry potter',
+        'paginationInput': {'pageNumber': 1, 'entriesPerPage': 100},
+        'itemFilter': [{'name': 'Condition', 'value': 'New'},
+                       {'name': 'ListingType', 'value': 'FixedPrice'}] * 5,
+    }}
+    ids = {'id': ['%d' % i for i in range(20)], 'readSet': ['ITEM_ID', 'TITLE']}
+
+    for api, verb, data in ((SOA(config_file=None), 'findItems', search),
+                            (FindItem(config_file=None), 'findItemsByIds', ids)):
+        start = time.time()
+        for i in range(num_requests):
+            api.build_request_data(verb, data, None)
+        elapsed = time.time() - start
+
+        print("%s %s x%d: %.3fs" % (api.__module__, verb, num_requests, elapsed))
+
+
+def prepared_call(num_requests=10000):
+    api = Trading(config_file=None, appid='a', devid='d', certid='c',
+                  token='AgAAAA')
+    call = api.prepare_call('GetOrders', {
+        'NumberOfDays': 30, 'Pagination': {'EntriesPerPage': 100,
+                                           'PageNumber': Slot('page')}})
+
+    start = time.time()
+    for i in range(num_requests):
+        api.build_request('GetOrders', {
+            'NumberOfDays': 30, 'Pagination': {'EntriesPerPage': 100,
+                                               'PageNumber': i}}, None)
+    built = time.time() - start
+
+    start = time.time()
+    for i in range(num_requests):
+        call.request(page=i)
+    prepared = time.time() - start
+
+    print("GetOrders pages x%d: build_request %.3fs, prepared %.3fs" %
+          (num_requests, built, prepared))
+
+
+def tls_server(handshake_delay=0.0):
+    """Starts a local HTTPS stand-in for the API, with a throwaway
+    self-signed certificate made by the openssl command.
+
+    Returns the server and the certificate path, to be passed as verify.
+    """
+
+    import ssl
+    import subprocess
+    import tempfile
+    import threading
+
+    try:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    except ImportError:
+        return None, None
+
+    certdir = tempfile.mkdtemp()
+    cert = os.path.join(certdir, 'cert.pem')
+    key = os.path.join(certdir, 'key.pem')
+    subprocess.check_call(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-keyout', key, '-out', cert, '-days', '1', '-subj', '/CN=127.0.0.1',
+         '-addext', 'subjectAltName=IP:127.0.0.1'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    reply = (b'<?xml version="1.0" encoding="UTF-8"?>'
+             b'<GeteBayOfficialTimeResponse xmlns="urn:ebay:apis:eBLBaseComponents">'
+             b'<Timestamp>2014-02-07T23:31:13.941Z</Timestamp><Ack>Success</Ack>'
+             b'</GeteBayOfficialTimeResponse>')
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/xml')
+            self.send_header('Content-Length', str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+        def get_request(self):
+            sock, addr = ThreadingHTTPServer.get_request(self)
+            # stands in for the network round trips of a remote handshake
+            time.sleep(handshake_delay)
+            return sock, addr
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+
+    server = Server(('127.0.0.1', 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, cert
+
+
+def keep_alive(num_calls=200, handshake_delay=0.0):
+    server, cert = tls_server(handshake_delay)
+    if server is None:
+        return
+
+    kwargs = dict(config_file=None, appid='a', devid='d', certid='c',
+                  token='AgAAAA', domain='127.0.0.1:%d' % server.server_port,
+                  verify=cert)
+
+    def closed_every_call():
+        # what every call did before connections were kept alive
+        with Trading(shared_session=False, **kwargs) as api:
+            for i in range(num_calls):
+                api.execute('GeteBayOfficialTime', {})
+                api.close()
+
+    def one_connection():
+        with Trading(shared_session=False, **kwargs) as api:
+            for i in range(num_calls):
+                api.execute('GeteBayOfficialTime', {})
+
+    def connection_per_call(shared_session):
+        for i in range(num_calls):
+            with Trading(shared_session=shared_session, **kwargs) as api:
+                api.execute('GeteBayOfficialTime', {})
+
+    for name, run in (('closed every call', closed_every_call),
+                      ('one connection', one_connection),
+                      ('connection per call, own session',
+                       lambda: connection_per_call(False)),
+                      ('connection per call, shared session',
+                       lambda: connection_per_call(True))):
+        start = time.time()
+        run()
+        elapsed = time.time() - start
+
+        print("GeteBayOfficialTime over local TLS x%d, %s: %.3fs (%.2fms/call)"
+              % (num_calls, name, elapsed, elapsed / num_calls * 1000))
+
+    server.shutdown()
+
+
+def threaded_calls(num_calls=400, threads=8):
+    from multiprocessing.pool import ThreadPool
+
+    server, cert = tls_server()
+    if server is None:
+        return
+
+    kwargs = dict(config_file=None, appid='a', devid='d', certid='c',
+                  token='AgAAAA', domain='127.0.0.1:%d' % server.server_port,
+                  verify=cert)
+    pool = ThreadPool(threads)
+
+    def connection_per_call(i):
+        Trading(**kwargs).execute('GeteBayOfficialTime', {})
+
+    api = Trading(**kwargs)
+
+    def shared_connection(i):
+        api.call('GeteBayOfficialTime', {})
+
+    for run in (connection_per_call, shared_connection):
+        start = time.time()
+        pool.map(run, range(num_calls))
+        elapsed = time.time() - start
+
+        print("GeteBayOfficialTime over local TLS x%d, %d threads, %s: %.3fs"
+              % (num_calls, threads, run.__name__, elapsed))
+
+    pool.close()
+    server.shutdown()
+
+
+def parallel_calls(num_calls=400, limit=8):
+    from ebaysdk.parallel import Parallel, ThreadBackend, AsyncioBackend
+
+    server, cert = tls_server()
+    if server is None:
+        return
+
+    try:
+        import aiohttp
+    except ImportError:
+        aiohttp = None
+
+    for backend in [ThreadBackend] + ([AsyncioBackend] if aiohttp else []):
+        with Parallel(backend(limit=limit)) as p:
+            for run in ('first', 'second'):
+                start = time.time()
+
+                for i in range(num_calls):
+                    Trading(config_file=None, appid='a', devid='d', certid='c',
+                            token='AgAAAA', domain='127.0.0.1:%d' % server.server_port,
+                            verify=cert, parallel=p).execute('GeteBayOfficialTime', {})
+                p.wait()
+
+                elapsed = time.time() - start
+
+                print("Parallel GeteBayOfficialTime over local TLS x%d, %s(limit=%d), %s wait(): %.3fs"
+                      % (num_calls, backend.__name__, limit, run, elapsed))
+
+    server.shutdown()
+
+
+def parallel_as_completed(num_calls=2000, max_in_flight=20):
+    import tracemalloc
+    from ebaysdk.parallel import Parallel, ThreadBackend
+
+    server, cert = tls_server()
+    if server is None:
+        return
+
+    def queue(p):
+        for i in range(num_calls):
+            Trading(config_file=None, appid='a', devid='d', certid='c',
+                    token='AgAAAA', domain='127.0.0.1:%d' % server.server_port,
+                    verify=cert, parallel=p).execute('GeteBayOfficialTime', {})
+
+    def wait(p):
+        p.wait()
+        return 0 if p.error() else num_calls
+
+    def as_completed(p):
+        return sum(1 for api in p.as_completed(max_in_flight)
+                   if api.response.reply.Ack == 'Success')
+
+    for run in (wait, as_completed):
+        with Parallel(ThreadBackend(limit=max_in_flight)) as p:
+            queue(p)
+            start = time.time()
+            succeeded = run(p)
+            elapsed = time.time() - start
+
+            # a second pass for the memory, tracing slows everything down
+            queue(p)
+            tracemalloc.start()
+            run(p)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        print("Parallel GeteBayOfficialTime over local TLS x%d, %s(): %d ok, %.3fs, peak %.1fMB"
+              % (num_calls, run.__name__, succeeded, elapsed, peak / 1e6))
+
+    server.shutdown()
+
+
+TIMESTAMPS = ['2014-02-07T23:31:13.941Z', '2014-02-07T23:31:13Z',
+              '2014-02-07T23:31:13.000-07:00', '2014-02-07T23:31:13']
+
+
+def legacy_datetime():
+    for value in TIMESTAMPS:
+        ts = "%s %s" % (value.partition(
+            'T')[0], value.partition('T')[2].partition('.')[0])
+        try:
+            datetime.datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            pass
+
+
+def fast_datetime():
+    for value in TIMESTAMPS:
+        parse_datetime(value)
+
+
 def main():
     sample_dict = {
         'searchFilter': {'categoryId': {'#text': 222, '@attrs': {'site': 'US'}}},
@@ -99,3 +517,24 @@ if __name__ == '__main__':
     print("Response Class %s" %
           timeit.repeat("response()", number=1000, repeat=9,
                         setup="from __main__ import response"))
+
+    print("strptime() datetimes %s" %
+          timeit.repeat("legacy_datetime()", number=10000, repeat=9,
+                        setup="from __main__ import legacy_datetime"))
+
+    print("parse_datetime() datetimes %s" %
+          timeit.repeat("fast_datetime()", number=10000, repeat=9,
+                        setup="from __main__ import fast_datetime"))
+
+    getorders_scaling()
+    getorders_projection()
+    parser_options()
+    compiled_request()
+    stream_request_memory()
+    request_headers()
+    soa_request()
+    prepared_call()
+    keep_alive()
+    threaded_calls()
+    parallel_calls()
+    parallel_as_completed()
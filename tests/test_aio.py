@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+'''
+Copyright 2012-2019 eBay Inc.
+Authored by: Tim Keefer
+Licensed under CDDL 1.0
+'''
+
+from __future__ import absolute_import
+import os
+import socket
+import unittest
+
+try:
+    import asyncio
+    from aiohttp import web
+    from ebaysdk import aio
+except (ImportError, SyntaxError):
+    web = None
+
+from ebaysdk.finding import Connection as Finding
+from ebaysdk.parallel import Parallel, AsyncioBackend
+from ebaysdk.exception import ConnectionError
+
+os.environ.setdefault("EBAY_YAML", "ebay.yaml")
+
+FINDING_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<findItemsAdvancedResponse xmlns="http://www.ebay.com/marketplace/search/v1/services">'
+    '<ack>%s</ack>%s<searchResult count="1"><item><itemId>%s</itemId></item></searchResult>'
+    '</findItemsAdvancedResponse>')
+
+FINDING_ERROR = (
+    '<error><errorId>5</errorId><domain>Marketplace</domain>'
+    '<severity>Error</severity><message>bad</message></error>')
+
+
+@unittest.skipIf(web is None, 'needs aiohttp')
+class TestAsync(unittest.TestCase):
+
+    def run_calls(self, calls):
+        "Runs calls(api) against a local server that echoes the keywords."
+
+        async def handler(request):
+            body = await request.text()
+            keywords = body.partition('<keywords>')[2].partition('<')[0]
+
+            if keywords == 'fail':
+                return web.Response(text=FINDING_RESPONSE % ('Failure', FINDING_ERROR, ''))
+
+            return web.Response(text=FINDING_RESPONSE % ('Success', '', keywords))
+
+        async def main():
+            app = web.Application()
+            app.router.add_post('/services/search/FindingService/v1', handler)
+
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.SockSite(runner, sock).start()
+
+            api = Finding(config_file=None, appid='a',
+                          domain='127.0.0.1:%d' % sock.getsockname()[1])
+            api.config.set('https', False, force=True)
+
+            try:
+                return await calls(api)
+            finally:
+                await aio.close_sessions()
+                await runner.cleanup()
+
+        return asyncio.run(main())
+
+    def test_execute_async(self):
+        async def calls(api):
+            return api, await asyncio.gather(*[
+                api.execute_async('findItemsAdvanced', {'keywords': str(i)},
+                                  offload=bool(i % 2))
+                for i in range(50)])
+
+        api, results = self.run_calls(calls)
+
+        for i, result in enumerate(results):
+            self.assertEqual(result.verb, 'findItemsAdvanced')
+            self.assertEqual(result.response.reply.ack, 'Success')
+            self.assertEqual(result.response.reply.searchResult.item[0].itemId, str(i))
+            self.assertIsNone(result.error())
+
+        self.assertIsNone(api.response)
+
+    def test_execute_async_errors(self):
+        async def calls(api):
+            with self.assertRaises(ConnectionError):
+                await api.execute_async('findItemsAdvanced', {'keywords': 'fail'})
+
+            api.config.set('errors', False, force=True)
+            return await api.execute_async('findItemsAdvanced', {'keywords': 'fail'})
+
+        result = self.run_calls(calls)
+
+        self.assertEqual(result.response_codes, [5])
+        self.assertEqual(result.error(), 'findItemsAdvanced: Domain: Marketplace, '
+                                         'Severity: Error, errorId: 5, bad')
+
+    def test_asyncio_backend(self):
+        async def calls(api):
+            with Parallel(AsyncioBackend(limit=5)) as p:
+                apis = []
+                for keywords in [str(i) for i in range(20)] + ['fail']:
+                    queued = Finding(config_file=None, appid='a', parallel=p,
+                                     domain=api.config.get('domain'))
+                    queued.config.set('https', False, force=True)
+                    queued.execute('findItemsAdvanced', {'keywords': keywords})
+                    apis.append(queued)
+
+                await asyncio.get_running_loop().run_in_executor(None, p.wait)
+
+            return p, apis
+
+        p, apis = self.run_calls(calls)
+
+        for i, api in enumerate(apis[:-1]):
+            self.assertEqual(api.response.reply.searchResult.item[0].itemId, str(i))
+
+        self.assertEqual(apis[-1].response_codes(), [5])
+        self.assertEqual(p.error(), "parallel error:\n'findItemsAdvanced: Domain: "
+                                    "Marketplace, Severity: Error, errorId: 5, bad'\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
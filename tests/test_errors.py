@@ -10,8 +10,11 @@ from __future__ import absolute_import
 import os
 import unittest
 import ebaysdk.shopping
+import ebaysdk.trading
 import lxml
 
+from ebaysdk.response import Response, ResponseDataObject
+
 os.environ.setdefault("EBAY_YAML", "ebay.yaml")
 
 class TestErrors(unittest.TestCase):
@@ -28,6 +31,26 @@ class TestErrors(unittest.TestCase):
             self.assertEqual(connection.response.status_code, 200)
             self.assertEqual(type(connection.response.dom()), lxml.etree._Element)
 
+    def test_trading_errors(self):
+        xml = b'<?xml version="1.0" encoding="UTF-8"?><GetItemResponse xmlns="urn:ebay:apis:eBLBaseComponents">' \
+              b'<Ack>Failure</Ack><Errors><ShortMessage>Bad item</ShortMessage><LongMessage>Item missing.</LongMessage>' \
+              b'<ErrorCode>17</ErrorCode><SeverityCode>Error</SeverityCode><ErrorClassification>RequestError</ErrorClassification></Errors>' \
+              b'<Errors><ShortMessage>Old version</ShortMessage><LongMessage>Upgrade.</LongMessage><ErrorCode>21917</ErrorCode>' \
+              b'<SeverityCode>Warning</SeverityCode></Errors></GetItemResponse>'
+
+        for materialize in (None, 'raw'):
+            connection = ebaysdk.trading.Connection(config_file=None, materialize=materialize)
+            connection.verb = 'GetItem'
+            connection.response = Response(ResponseDataObject({'content': xml}, []), verb='GetItem',
+                                           materialize=materialize)
+
+            self.assertEqual(connection.error(),
+                             'GetItem: Class: RequestError, Severity: Error, Code: 17, Bad item Item missing.')
+            self.assertEqual(connection.warnings(),
+                             'GetItem: Class: None, Severity: Warning, Code: 21917, Old version Upgrade.')
+            self.assertEqual(connection.response_codes(), [17, 21917])
+            self.assertEqual([r.severity for r in connection.error_records()], ['Error', 'Warning'])
+
 if __name__ == '__main__':
     unittest.main()
 
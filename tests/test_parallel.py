@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+'''
+Copyright 2012-2019 eBay Inc.
+Authored by: Tim Keefer
+Licensed under CDDL 1.0
+'''
+
+from __future__ import absolute_import
+import os
+import threading
+import time
+import unittest
+from requests.models import Response
+from requests.exceptions import ConnectTimeout
+from ebaysdk.trading import Connection as Trading
+from ebaysdk.parallel import Parallel, ThreadBackend
+
+os.environ.setdefault("EBAY_YAML", "ebay.yaml")
+
+GETITEM_RESPONSE = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<GetItemResponse xmlns="urn:ebay:apis:eBLBaseComponents"><Ack>%s</Ack>%s'
+    b'<Item><ItemID>%s</ItemID></Item></GetItemResponse>')
+
+GETITEM_ERROR = (
+    b'<Errors><ShortMessage>bad</ShortMessage><LongMessage>bad item</LongMessage>'
+    b'<ErrorCode>10007</ErrorCode><SeverityCode>Error</SeverityCode>'
+    b'<ErrorClassification>RequestError</ErrorClassification></Errors>')
+
+
+class SlowSession(object):
+    "Answers with the ItemID of the request, counting the requests in flight."
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            self.sent += 1
+
+        try:
+            item_id = request.body.partition(b'<ItemID>')[2].partition(b'<')[0]
+            time.sleep(self.delay * 20 if item_id == b'slow' else self.delay)
+
+            if item_id == b'timeout':
+                raise ConnectTimeout('timed out')
+
+            response = Response()
+            response.status_code = 200
+            response.reason = 'OK'
+            response.url = request.url
+            response.request = request
+
+            if item_id == b'fail':
+                response._content = GETITEM_RESPONSE % (b'Failure', GETITEM_ERROR, item_id)
+            else:
+                response._content = GETITEM_RESPONSE % (b'Success', b'', item_id)
+
+            return response
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestParallel(unittest.TestCase):
+
+    def queue(self, parallel, session, item_ids):
+        apis = []
+        for item_id in item_ids:
+            api = Trading(config_file=None, appid='a', devid='d', certid='c',
+                          token='AgAAAA', parallel=parallel)
+            api.session = session
+            api.execute('GetItem', {'ItemID': item_id})
+            apis.append(api)
+
+        return apis
+
+    def test_thread_backend(self):
+        session = SlowSession()
+
+        with Parallel(ThreadBackend(limit=4)) as p:
+            apis = self.queue(p, session, [str(i) for i in range(30)])
+            self.assertTrue(all(api.response is None for api in apis))
+
+            p.wait()
+
+        self.assertIsNone(p.error())
+        self.assertEqual(session.most_in_flight, 4)
+
+        for i, api in enumerate(apis):
+            self.assertEqual(api.response.reply.Ack, 'Success')
+            self.assertEqual(api.response.reply.Item.ItemID, str(i))
+
+    def test_thread_backend_errors(self):
+        session = SlowSession()
+
+        with Parallel() as p:
+            apis = self.queue(p, session, ['1', 'timeout', 'fail', '2'])
+            p.wait()
+
+        self.assertEqual(p.error(), 'parallel error:\ntimed out\n'
+                                    "'GetItem: Class: RequestError, Severity: Error, "
+                                    "Code: 10007, bad bad item'\n")
+
+        self.assertEqual(apis[0].response.reply.Item.ItemID, '1')
+        self.assertIsNone(apis[1].response)
+        self.assertEqual(apis[2].response_codes(), [10007])
+        self.assertEqual(apis[3].response.reply.Item.ItemID, '2')
+
+        p.wait()
+        self.assertIsNone(p.error())
+
+    def test_as_completed(self):
+        session = SlowSession()
+
+        with Parallel() as p:
+            self.queue(p, session, ['slow'] + [str(i) for i in range(19)])
+
+            seen = []
+            for api in p.as_completed(max_in_flight=3):
+                # nothing is sent beyond the responses handed back
+                self.assertLessEqual(session.sent, len(seen) + 3)
+                self.assertLessEqual(session.in_flight, 3)
+                time.sleep(0.002)
+
+                seen.append(api.response.reply.Item.ItemID)
+                if api.response.reply.Item.ItemID == '0':
+                    self.queue(p, session, ['queued'])
+
+        self.assertIsNone(p.error())
+        self.assertEqual(session.most_in_flight, 3)
+        self.assertEqual(sorted(seen), sorted(['slow', 'queued'] + [str(i) for i in range(19)]))
+        self.assertNotEqual(seen[0], 'slow')
+
+    def test_as_completed_errors(self):
+        session = SlowSession()
+
+        with Parallel() as p:
+            apis = self.queue(p, session, ['timeout', '1', 'fail', '2', '3'])
+
+            completed = p.as_completed(max_in_flight=1)
+            self.assertIs(next(completed), apis[1])
+            self.assertIs(next(completed), apis[2])
+            self.assertEqual(apis[2].response_codes(), [10007])
+            completed.close()
+
+            self.assertIsNone(apis[3].response)
+            self.assertEqual(list(p.as_completed(max_in_flight=1)), apis[3:])
+
+        self.assertIsNone(p.error())
+
+
+if __name__ == '__main__':
+    unittest.main()
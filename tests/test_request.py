@@ -10,11 +10,57 @@ from __future__ import absolute_import
 import os
 import unittest
 import re
-from ebaysdk.utils import dict2xml
+import copy
+import types
+import datetime
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+from requests.models import Response
+from ebaysdk.utils import dict2xml, Slot
+from ebaysdk.trading import Connection as Trading
+from ebaysdk.finding import Connection as Finding
+from ebaysdk.connection import shared_session
+from ebaysdk.exception import ConnectionError
 
 os.environ.setdefault("EBAY_YAML", "ebay.yaml")
 
 
+class CannedSession(object):
+    """Answers every request with the same response body.
+
+    Keeps the chunks of the generator bodies it was sent in chunks.
+    """
+
+    def __init__(self, content, status_code=200, reason='OK'):
+        self.content = content
+        self.status_code = status_code
+        self.reason = reason
+        self.chunks = []
+
+    def send(self, request, **kwargs):
+        if isinstance(request.body, types.GeneratorType):
+            self.chunks.append(list(request.body))
+
+        response = Response()
+        response.status_code = self.status_code
+        response.reason = self.reason
+        response.url = request.url
+        response.request = request
+        response._content = self.content
+        return response
+
+
+GETITEM_RESPONSE = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<GetItemResponse xmlns="urn:ebay:apis:eBLBaseComponents"><Ack>%s</Ack>%s'
+    b'<Item><ItemID>110</ItemID></Item></GetItemResponse>')
+
+GETITEM_ERROR = (
+    b'<Errors><ShortMessage>bad</ShortMessage><LongMessage>bad item</LongMessage>'
+    b'<ErrorCode>10007</ErrorCode><SeverityCode>Error</SeverityCode>'
+    b'<ErrorClassification>RequestError</ErrorClassification></Errors>')
+
+
 class TestBase(unittest.TestCase):
 
     def test_motors_compat_request_xml(self):
@@ -62,6 +108,310 @@ class TestBase(unittest.TestCase):
 
         self.assertEqual(dict2xml(motors_dict), motors_xml)
 
+    def test_dict2xml_does_not_mutate(self):
+        request = {
+            'searchFilter': {'categoryId': {'#text': 222, '@attrs': {'site': 'US'}}},
+            'itemFilter': [
+                {'name': 'Condition', 'value': 'Used', '@attrs': {'id': 1}},
+                {'name': 'LocatedIn', 'value': 'GB'},
+            ],
+            'outputSelector': {'@attrs': {'mode': 'full'}},
+        }
+        original = copy.deepcopy(request)
+
+        xml = dict2xml(request)
+
+        self.assertEqual(xml, '<itemFilter id="1"><name>Condition</name><value>Used</value></itemFilter>'
+                              '<itemFilter><name>LocatedIn</name><value>GB</value></itemFilter>'
+                              '<outputSelector mode="full"></outputSelector>'
+                              '<searchFilter><categoryId site="US">222</categoryId></searchFilter>')
+        self.assertEqual(dict2xml(request), xml)
+        self.assertEqual(request, original)
+
+    def test_compile_request(self):
+        api = Trading(config_file=None, token='AgAAAA', escape_xml=True)
+        template = api.compile_request('ReviseInventoryStatus', {
+            'InventoryStatus': {'ItemID': Slot('item'), 'Quantity': Slot('quantity'),
+                                'StartPrice': {'#text': Slot('price'), '@attrs': {'currencyID': 'USD'}}}
+        })
+
+        for item, quantity, price in (('110', 1, '9.99'), ('<b>&', 0, '1.00')):
+            body = api.build_request_data('ReviseInventoryStatus', {
+                'InventoryStatus': {'ItemID': item, 'Quantity': quantity,
+                                    'StartPrice': {'#text': price, '@attrs': {'currencyID': 'USD'}}}
+            }, None)
+            rendered = template.render(item=item, quantity=quantity, price=price)
+
+            self.assertEqual(rendered.verb, 'ReviseInventoryStatus')
+            self.assertEqual(rendered.body, body.encode('utf-8'))
+
+        self.assertRaises(ValueError, template.render, item='110', quantity=1)
+        self.assertRaises(ValueError, template.render, item='110', quantity=1, price='1', sku='x')
+
+    def test_request_headers_follow_config(self):
+        api = Trading(config_file=None, appid='a', devid='d', certid='c', siteid='0')
+
+        api.build_request('GetItem', {}, None)
+        self.assertEqual(api.request.headers['X-EBAY-API-SITEID'], '0')
+        self.assertEqual(api.request.headers['X-EBAY-API-CALL-NAME'], 'GetItem')
+
+        api.build_request('GetUser', {}, None)
+        self.assertEqual(api.request.headers['X-EBAY-API-CALL-NAME'], 'GetUser')
+
+        api.config.set('siteid', '3', force=True)
+        api.config.set('domain', 'api.sandbox.ebay.com', force=True)
+        api.build_request('GetItem', {}, None)
+        self.assertEqual(api.request.headers['X-EBAY-API-SITEID'], '3')
+        self.assertEqual(api.request.url, 'https://api.sandbox.ebay.com/ws/api.dll')
+
+    def test_parser_options(self):
+        api = Trading(config_file=None, appid='a', devid='d', certid='c',
+                      token='AgAAAA', huge_tree=True)
+        api.session = CannedSession(GETITEM_RESPONSE % (b'Success', b''))
+
+        api.execute('GetItem', {'ItemID': '110'})
+        version, cache = api.config.version, api._get_request_cache()
+        options = api._get_parser_options()
+
+        api.execute('GetItem', {'ItemID': '110'})
+        self.assertEqual(api.config.version, version)
+        self.assertIs(api._get_request_cache(), cache)
+        self.assertIs(api._get_parser_options(), options)
+        self.assertTrue(options['huge_tree'])
+        self.assertFalse(options['resolve_entities'])
+
+        api.config.set('huge_tree', False, force=True)
+        self.assertFalse(api._get_parser_options()['huge_tree'])
+
+    def test_prepare_call(self):
+        api = Trading(config_file=None, appid='a', devid='d', certid='c', token='AgAAAA')
+        call = api.prepare_call('GetOrders', {
+            'NumberOfDays': 3, 'Pagination': {'EntriesPerPage': 100, 'PageNumber': Slot('page')}})
+
+        seen = set()
+        for page in (2, 3):
+            api.build_request('GetOrders', {
+                'NumberOfDays': 3, 'Pagination': {'EntriesPerPage': 100, 'PageNumber': page}}, None)
+            request = call.request(page=page)
+
+            self.assertEqual(request.url, api.request.url)
+            self.assertEqual(request.body, api.request.body)
+
+            built, prepared = dict(api.request.headers), dict(request.headers)
+            seen.add(prepared.pop('X-EBAY-SDK-REQUEST-ID'))
+            del built['X-EBAY-SDK-REQUEST-ID']
+            self.assertEqual(prepared, built)
+
+        self.assertEqual(len(seen), 2)
+
+        api.config.set('siteid', '3', force=True)
+        self.assertEqual(call.request(page=1).headers['X-EBAY-API-SITEID'], '3')
+
+    def test_failed_page_keeps_request_dict(self):
+        api = Finding(config_file=None, appid='a')
+        api.session = CannedSession(
+            b'<?xml version="1.0" encoding="UTF-8"?>'
+            b'<findItemsAdvancedResponse xmlns="http://www.ebay.com/marketplace/search/v1/services">'
+            b'<ack>Success</ack><paginationOutput><pageNumber>1</pageNumber>'
+            b'<totalPages>3</totalPages></paginationOutput></findItemsAdvancedResponse>')
+
+        api.execute('findItemsAdvanced', {'keywords': 'a'})
+        api.session.status_code, api.session.reason = 500, 'Internal Server Error'
+
+        self.assertRaises(ConnectionError, api.next_page)
+        self.assertEqual(api._request_dict, {'keywords': 'a', 'paginationInput': {'pageNumber': 2}})
+
+        api = Trading(config_file=None, appid='a', devid='d', certid='c', token='AgAAAA')
+        api.session = CannedSession(
+            b'<?xml version="1.0" encoding="UTF-8"?>'
+            b'<GetOrdersResponse xmlns="urn:ebay:apis:eBLBaseComponents"><Ack>Success</Ack>'
+            b'<PaginationResult><TotalNumberOfPages>3</TotalNumberOfPages></PaginationResult>'
+            b'</GetOrdersResponse>')
+
+        api.verb, api._request_dict = 'GetOrders', {'NumberOfDays': 3}
+        pages = api.pages()
+        next(pages)
+        api.session.status_code, api.session.reason = 500, 'Internal Server Error'
+
+        self.assertRaises(ConnectionError, next, pages)
+        self.assertEqual(api._request_dict, {'NumberOfDays': 3, 'Pagination': {'PageNumber': 2}})
+
+    def stream_request(self, data, files=None):
+        "Returns the body execute() sends without and with stream_request."
+
+        bodies = []
+        for stream_request in (False, True):
+            api = Trading(config_file=None, appid='a', devid='d', certid='c',
+                          token='AgAAAA', stream_request=stream_request)
+            api.session = CannedSession(GETITEM_RESPONSE % (b'Success', b''))
+
+            api.execute('UploadSiteHostedPictures', data, files=files and dict(
+                (k, (name, BytesIO(content))) for k, (name, content) in files.items()))
+
+            if stream_request:
+                self.assertEqual(len(api.session.chunks), 1)
+                chunks = api.session.chunks[0]
+                self.assertGreater(len(chunks), 1)
+                self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+                self.assertNotIn('Content-Length', api.request.headers)
+                body = b''.join(chunks)
+            else:
+                self.assertEqual(api.session.chunks, [])
+                body = api.request.body
+
+            # requests picks its own multipart boundary
+            boundary = api.request.headers['Content-Type'].partition('boundary=')[2]
+            if boundary:
+                body = body.replace(boundary.encode('utf-8'), b'BOUNDARY')
+
+            bodies.append(body)
+
+        return bodies
+
+    def test_stream_request(self):
+        data = {'PictureName': 'a & b', 'PictureSet': 'Supersize',
+                'Item': [{'Title': u'title \u00e9 %d' % i, 'SKU': str(i)} for i in range(5000)]}
+
+        body, streamed = self.stream_request(data)
+        self.assertEqual(streamed, body)
+        self.assertGreater(len(body), 65536)
+
+    def test_stream_request_files(self):
+        data = {'PictureName': 'picture', 'Item': [{'SKU': str(i)} for i in range(5000)]}
+        files = {'file': ('picture.jpg', b'\xff\xd8' + b'\x00' * 100000)}
+
+        body, streamed = self.stream_request(data, files)
+        self.assertEqual(streamed, body)
+        self.assertIn(b'filename="picture.jpg"', body)
+        self.assertIn(b'\xff\xd8' + b'\x00' * 100000, body)
+
+    def test_connection_pool(self):
+        with Trading(config_file=None, pool_connections=2, pool_maxsize=4,
+                     shared_session=False) as api:
+            for url in ('https://api.ebay.com', 'http://api.ebay.com'):
+                poolmanager = api.session.get_adapter(url).poolmanager
+                self.assertEqual(poolmanager.connection_pool_kw['maxsize'], 4)
+
+            poolmanager.connection_from_url('http://api.ebay.com')
+            self.assertEqual(len(poolmanager.pools), 1)
+
+        self.assertEqual(len(poolmanager.pools), 0)
+
+    def test_shared_session(self):
+        api = Trading(config_file=None)
+        other = Trading(config_file=None)
+        sandbox = Trading(config_file=None, domain='api.sandbox.ebay.com')
+
+        self.assertIs(api.session, other.session)
+        self.assertIs(api.session, shared_session('https://api.ebay.com/ws/api.dll'))
+        self.assertIsNot(api.session, sandbox.session)
+        self.assertIsNot(api.session, Trading(config_file=None, proxy_host='proxy').session)
+        self.assertIsNot(api.session, Trading(config_file=None, shared_session=False).session)
+
+        session = api.session
+        api.close()
+        self.assertIs(other.session, session)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_shared_session_after_fork(self):
+        session = shared_session('https://api.ebay.com/ws/api.dll')
+
+        pid = os.fork()
+        if pid == 0:
+            os._exit(int(shared_session('https://api.ebay.com/ws/api.dll') is session))
+
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+        self.assertIs(shared_session('https://api.ebay.com/ws/api.dll'), session)
+
+    def test_call(self):
+        api = Trading(config_file=None, appid='a', devid='d', certid='c', token='AgAAAA')
+        api.session = CannedSession(GETITEM_RESPONSE % (b'Success', b''))
+
+        def call(item_id):
+            return api.call('GetItem', {'ItemID': item_id})
+
+        results = ThreadPool(4).map(call, [str(i) for i in range(20)])
+
+        for i, result in enumerate(results):
+            self.assertEqual(result.verb, 'GetItem')
+            self.assertIn(('<ItemID>%d</ItemID>' % i).encode('utf-8'), result.request.body)
+            self.assertEqual(result.request.headers['X-EBAY-SDK-REQUEST-ID'], str(result.request_id))
+            self.assertEqual(result.response.reply.Ack, 'Success')
+            self.assertIsNone(result.error())
+
+        self.assertEqual(len(set(r.request_id for r in results)), 20)
+        self.assertIsNone(api.request)
+        self.assertIsNone(api.response)
+
+    def test_call_errors(self):
+        api = Trading(config_file=None, appid='a', devid='d', certid='c', token='AgAAAA')
+        api.session = CannedSession(GETITEM_RESPONSE % (b'Failure', GETITEM_ERROR))
+        message = 'GetItem: Class: RequestError, Severity: Error, Code: 10007, bad bad item'
+
+        self.assertRaises(ConnectionError, api.call, 'GetItem', {'ItemID': '110'})
+        self.assertRaises(ConnectionError, api.execute, 'GetItem', {'ItemID': '110'})
+        self.assertEqual(api.error(), message)
+
+        api.config.set('errors', False, force=True)
+        result = api.call('GetItem', {'ItemID': '110'})
+        self.assertEqual(result.error(), message)
+        self.assertEqual(result.response_codes, [10007])
+        self.assertEqual(result.error_records[0].code, 10007)
+
+        api.execute('GetItem', {'ItemID': '110'})
+        self.assertEqual(api.error(), message)
+        self.assertEqual(api.response_codes(), [10007])
+
+    def test_precise_datetimes(self):
+        content = (b'<?xml version="1.0" encoding="UTF-8"?>'
+                   b'<GetItemResponse xmlns="urn:ebay:apis:eBLBaseComponents">'
+                   b'<Timestamp>2014-02-07T23:31:13.941Z</Timestamp><Ack>Success</Ack>'
+                   b'</GetItemResponse>')
+
+        api = Trading(config_file=None, appid='a', devid='d', certid='c', token='AgAAAA')
+        api.session = CannedSession(content)
+
+        timestamp = api.execute('GetItem', {'ItemID': '110'}).reply.Timestamp
+        self.assertEqual(timestamp, datetime.datetime(2014, 2, 7, 23, 31, 13))
+
+        api.precise_datetimes = True
+        timestamp = api.execute('GetItem', {'ItemID': '110'}).reply.Timestamp
+        self.assertEqual(timestamp.isoformat(), '2014-02-07T23:31:13.941000+00:00')
+
+    def test_overridden_process_response(self):
+        class Connection(Trading):
+            def execute_request(self, stream=False):
+                self.sent = True
+                super(Connection, self).execute_request(stream)
+
+            def process_response(self, parse_response=True, stream_nodes=None):
+                super(Connection, self).process_response(parse_response, stream_nodes)
+                self.response.reply.Processed = True
+
+        api = Connection(config_file=None, appid='a', devid='d', certid='c', token='AgAAAA')
+        api.session = CannedSession(GETITEM_RESPONSE % (b'Success', b''))
+
+        reply = api.execute('GetItem', {'ItemID': '110'}).reply
+        self.assertTrue(api.sent)
+        self.assertTrue(reply.Processed)
+        self.assertEqual(reply.Item.ItemID, '110')
+
+        api.session = CannedSession(GETITEM_RESPONSE % (b'Failure', GETITEM_ERROR))
+        self.assertRaises(ConnectionError, api.execute, 'GetItem', {'ItemID': '110'})
+        self.assertEqual(api.response_codes(), [10007])
+
+    def test_overridden_error_check(self):
+        class Connection(Trading):
+            def _get_resp_body_errors(self):
+                return ['GetItem: boom']
+
+        api = Connection(config_file=None, appid='a', devid='d', certid='c', token='AgAAAA')
+        api.session = CannedSession(GETITEM_RESPONSE % (b'Success', b''))
+
+        self.assertRaises(ConnectionError, api.execute, 'GetItem', {'ItemID': '110'})
+        self.assertEqual(api.error(), 'GetItem: GetItem: boom')
+        self.assertEqual(api.response.reply.Ack, 'Success')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+'''
+Copyright 2012-2019 eBay Inc.
+Authored by: Tim Keefer
+Licensed under CDDL 1.0
+'''
+
+from __future__ import absolute_import
+import os
+import datetime
+import unittest
+from ebaysdk.trading import Connection as Trading
+from ebaysdk.response import ResponseDataObject, LazyResponseDataObject
+from tests.test_request import CannedSession
+
+os.environ.setdefault("EBAY_YAML", "ebay.yaml")
+
+GETORDERS_RESPONSE = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<GetOrdersResponse xmlns="urn:ebay:apis:eBLBaseComponents"><Ack>Success</Ack>'
+    b'<OrderArray><Order><OrderID>1</OrderID><!-- first order -->'
+    b'<Total currencyID="USD">9.5</Total><CreatedDate>2014-02-07T23:31:13.000Z</CreatedDate>'
+    b'<TransactionArray><Transaction><TransactionID>11</TransactionID>'
+    b'<PaidTime>2014-02-08T10:00:00.000Z</PaidTime></Transaction></TransactionArray></Order>'
+    b'<Order><OrderID>2</OrderID><Total currencyID="EUR">3.0</Total>'
+    b'<TransactionArray><Transaction><TransactionID>21</TransactionID></Transaction>'
+    b'<Transaction><TransactionID>22</TransactionID></Transaction></TransactionArray></Order>'
+    b'</OrderArray><PageNumber>1</PageNumber></GetOrdersResponse>')
+
+
+def plain(value):
+    "Turns a reply into plain dicts and lists, loading lazy objects."
+
+    if isinstance(value, list):
+        return [plain(v) for v in value]
+
+    if isinstance(value, ResponseDataObject):
+        if isinstance(value, LazyResponseDataObject):
+            value._lazy_load_all()
+
+        return dict((k, plain(v)) for k, v in value.__dict__.items()
+                    if not k.startswith('_lazy'))
+
+    return value
+
+
+class TestResponse(unittest.TestCase):
+
+    def execute(self, connection_kwargs=None, **kwargs):
+        api = Trading(config_file=None, appid='a', devid='d', certid='c',
+                      token='AgAAAA', **(connection_kwargs or {}))
+        api.session = CannedSession(GETORDERS_RESPONSE)
+
+        return api, api.execute('GetOrders', {'OrderStatus': 'All'}, **kwargs)
+
+    def setUp(self):
+        self.response = self.execute()[1]
+
+    def test_stream_nodes(self):
+        api, orders = self.execute(stream_nodes=['OrderArray.Order'])
+        orders = list(orders)
+
+        self.assertEqual([plain(o) for o in orders],
+                         plain(self.response.reply.OrderArray.Order))
+
+        # everything but the streamed orders is kept
+        expected = dict(self.response.dict(), OrderArray=None)
+        self.assertEqual(api.response.dict(), expected)
+        self.assertEqual(plain(api.response.reply), expected)
+
+    def test_lazy_reply(self):
+        response = self.execute({'lazy_reply': True})[1]
+
+        self.assertIsInstance(response.reply, LazyResponseDataObject)
+        self.assertEqual(response.reply.OrderArray.Order[1].Total._currencyID, 'EUR')
+        self.assertEqual(plain(response.reply), plain(self.response.reply))
+        self.assertEqual(response.dict(), self.response.dict())
+
+    def test_materialize(self):
+        for materialize in ('raw', 'dom', 'dict', 'reply', ['dict', 'reply']):
+            response = self.execute(materialize=materialize)[1]
+
+            # nothing else is built up front
+            kept = frozenset([materialize] if isinstance(materialize, str) else materialize)
+            self.assertEqual(response._dom is not None, 'dom' in kept)
+            self.assertEqual(response._dict is not None, 'dict' in kept)
+            self.assertEqual(response._reply is not None, 'reply' in kept)
+
+            self.assertEqual(response.dict(), self.response.dict())
+            self.assertEqual(plain(response.reply), plain(self.response.reply))
+            self.assertEqual(response.dom().findtext('PageNumber'), '1')
+
+        self.assertRaises(ValueError, self.execute, materialize='xml')
+
+    def test_reply_from_tree(self):
+        reply = self.response.reply
+
+        # what the reply used to be built from
+        expected = ResponseDataObject(self.response.dict(), self.response._datetime_nodes)
+        self.assertEqual(plain(reply), plain(expected))
+
+        order = reply.OrderArray.Order[0]
+        self.assertEqual((order.Total._currencyID, order.Total.value), ('USD', '9.5'))
+        self.assertEqual(order.CreatedDate, datetime.datetime(2014, 2, 7, 23, 31, 13))
+        self.assertEqual(len(order.TransactionArray.Transaction), 1)
+
+    def test_fields(self):
+        fields = ['OrderArray.Order.OrderID', 'orderarray.order.transactionarray']
+        response = self.execute(fields=fields)[1]
+
+        # Ack is kept regardless
+        orders = self.response.dict()['OrderArray']['Order']
+        expected = {
+            'Ack': 'Success',
+            'OrderArray': {'Order': [
+                {'OrderID': o['OrderID'], 'TransactionArray': o['TransactionArray']}
+                for o in orders]},
+        }
+        self.assertEqual(response.dict(), expected)
+
+        expected = plain(ResponseDataObject(expected, self.response._datetime_nodes))
+        self.assertEqual(plain(response.reply), expected)
+        self.assertFalse(response.reply.OrderArray.Order[0].has_key('Total'))
+
+        response = self.execute({'lazy_reply': True}, fields=fields)[1]
+        self.assertEqual(plain(response.reply), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()